@@ -0,0 +1,71 @@
+import json
+import logging
+import threading
+
+from django.conf import settings
+
+__all__ = ['EventPostingError', 'last', 'post']
+
+logger = logging.getLogger('backend.event')
+
+
+class EventPostingError(RuntimeError):
+    pass
+
+
+if not settings.EVENT_DAEMON_USE:
+    real = False
+
+    def post(channel, message):
+        return 0
+
+    def last():
+        return 0
+else:
+    from websocket import WebSocketException, create_connection
+
+    real = True
+    _local = threading.local()
+
+    class EventPoster(object):
+        def __init__(self):
+            self._conn = create_connection(settings.EVENT_DAEMON_POST)
+
+        def _command(self, command, tries=0, **kwargs):
+            try:
+                self._conn.send(json.dumps(dict(kwargs, command=command)))
+                resp = json.loads(self._conn.recv())
+            except WebSocketException:
+                if tries > 10:
+                    raise
+                self._conn = create_connection(settings.EVENT_DAEMON_POST)
+                return self._command(command, tries + 1, **kwargs)
+            if resp['status'] == 'error':
+                raise EventPostingError(resp['code'])
+            return resp['id']
+
+        def post(self, channel, message):
+            return self._command('post', channel=channel, message=message)
+
+        def last(self):
+            return self._command('last-msg')
+
+    def _get_poster():
+        if 'poster' not in _local.__dict__:
+            _local.poster = EventPoster()
+        return _local.poster
+
+    def post(channel, message):
+        try:
+            return _get_poster().post(channel, message)
+        except (WebSocketException, OSError):
+            logger.warning('Failed to post event to %s', channel, exc_info=True)
+            _local.__dict__.pop('poster', None)
+        return 0
+
+    def last():
+        try:
+            return _get_poster().last()
+        except (WebSocketException, OSError):
+            _local.__dict__.pop('poster', None)
+        return 0
@@ -1,5 +1,10 @@
+import hashlib
+from functools import lru_cache
+
 from django.utils.html import escape, mark_safe
 
+from backend.utils.cachedict import LRUCache
+
 __all__ = ['highlight_code']
 
 
@@ -27,11 +32,31 @@ else:
         def wrap(self, source, outfile):
             return self._wrap_div(self._wrap_pre(_wrap_code(source)))
 
-    def highlight_code(code, language, cssclass='highlight'):
+    @lru_cache(maxsize=128)
+    def _get_lexer(language):
         try:
-            lexer = pygments.lexers.get_lexer_by_name(language)
+            return pygments.lexers.get_lexer_by_name(language)
         except pygments.util.ClassNotFound:
+            return None
+
+    @lru_cache(maxsize=16)
+    def _get_formatter(cssclass):
+        return HtmlCodeFormatter(cssclass=cssclass)
+
+    # Highlighted HTML keyed by language, CSS class and the hash of the code.
+    _highlighted = LRUCache(maxsize=1024)
+
+    def highlight_code(code, language, cssclass='highlight'):
+        key = (language, cssclass, hashlib.sha1(code.encode('utf-8')).digest())
+        result = _highlighted.get(key)
+        if result is not None:
+            return result
+
+        lexer = _get_lexer(language)
+        if lexer is None:
             return _make_pre_code(code)
 
         # return mark_safe(pygments.highlight(code, lexer, HtmlCodeFormatter(cssclass=cssclass, linenos='table')))
-        return mark_safe(pygments.highlight(code, lexer, HtmlCodeFormatter(cssclass=cssclass)))
+        result = mark_safe(pygments.highlight(code, lexer, _get_formatter(cssclass)))
+        _highlighted.set(key, result)
+        return result
@@ -0,0 +1,49 @@
+import timeit
+
+import mistune
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from backend.templatetags.markdown import AwesomeInlineLexer, AwesomeRenderer, MarkdownPipeline, get_pipeline
+
+SAMPLE = '''Let $x$ be a positive integer such that ~x^2 + 1~ is prime.
+
+1. Find **all** such *x* below 100.
+2. Prove that [the sequence](https://example.com/sequence) is infinite.
+
+$$\\sum_{i=1}^{n} i = \\frac{n(n+1)}{2}$$
+'''
+
+
+class Command(BaseCommand):
+    help = 'measures the per-call overhead of building markdown renderers against reusing them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--style', default='description', help='markdown style to render with')
+        parser.add_argument('-n', '--number', type=int, default=2000, help='number of calls to time')
+
+    def handle(self, *args, **options):
+        style = options['style']
+        number = options['number']
+        styles = settings.MARKDOWN_STYLES.get(style, settings.MARKDOWN_DEFAULT_STYLE)
+
+        def build():
+            renderer = AwesomeRenderer(escape=styles.get('safe_mode', True), nofollow=styles.get('nofollow', True),
+                                       texoid=False, math=False, math_engine=None)
+            mistune.Markdown(renderer=renderer, inline=AwesomeInlineLexer, parse_block_html=1, parse_inline_html=1)
+
+        def build_pipeline():
+            MarkdownPipeline(style)
+
+        def render_fresh():
+            MarkdownPipeline(style).render(SAMPLE)
+
+        def render_reused():
+            get_pipeline(style).render(SAMPLE)
+
+        for name, func in (('construct renderer and parser', build),
+                           ('construct pipeline', build_pipeline),
+                           ('render with a new pipeline', render_fresh),
+                           ('render with the thread pipeline', render_reused)):
+            elapsed = timeit.timeit(func, number=number)
+            self.stdout.write('%-34s %8.1f us/call' % (name, elapsed / number * 1e6))
@@ -1,33 +1,46 @@
+import time
+
 import pytz
 from django.conf import settings
 from django.db import connection
 from django.utils import timezone
 from django.utils.timezone import make_aware
 
-class EmathLoginMiddleware(object):
-    def __init__(self, get_respone):
-        self.get_response = get_respone
-    
-    def __call__(self, request):
-        if request.user.is_authenticated:
-            request.profile = request.user.profile
-        else:
-            request.profile = None
-        
-        return self.get_response(request)
+from backend.models import Profile
+
+class ProfileMiddleware(object):
+    """
+    Loads the profile of the logged in user with its current participation and contest in a single query, and
+    takes the user out of that contest once it has ended or stopped being accessible.
 
+    Whether the participation is still active is remembered in the session until the participation ends, so the
+    access check only runs again once it may have changed.
+    """
 
-class ContestMiddleware(object):
     def __init__(self, get_response):
         self.get_response = get_response
 
+    def update_contest(self, request, profile):
+        participation = profile.current_contest
+        if participation is None:
+            return
+        active = request.session.get('contest_active')
+        if active and active[0] == participation.id and time.time() < active[1]:
+            return
+        profile.update_contest()
+        if profile.current_contest is not None:
+            request.session['contest_active'] = [participation.id, participation.end_time.timestamp()]
+
     def __call__(self, request):
         if request.user.is_authenticated:
-            profile = request.user.profile
-            profile.update_contest()
+            profile = Profile.objects.select_related('current_contest__contest').get(user=request.user)
+            request.user.profile = profile
+            self.update_contest(request, profile)
+            request.profile = profile
             request.participation = profile.current_contest
             request.in_contest = request.participation is not None
         else:
+            request.profile = None
             request.in_contest = False
             request.participation = None
         return self.get_response(request)
@@ -40,7 +53,7 @@ class TimezoneMiddleware(object):
     def get_timezone(self, request):
         tzname = settings.DEFAULT_USER_TIME_ZONE
         if request.user.is_authenticated:
-            tzname = request.user.profile.timezone
+            tzname = request.profile.timezone
         return pytz.timezone(tzname)
 
     def __call__(self, request):
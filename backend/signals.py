@@ -1,9 +1,16 @@
-from backend.models import User, Profile
+from backend.models import User, Profile, NavigationBar
+from backend.utils.versioned_cache import bump_version
 
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
 @receiver(post_save, sender=User)
 def create_profile(sender, instance, created, **kwargs):
   if created:
-    Profile.objects.create(user=instance)
\ No newline at end of file
+    Profile.objects.create(user=instance)
+
+
+@receiver(post_save, sender=NavigationBar)
+@receiver(post_delete, sender=NavigationBar)
+def navigation_bar_update(sender, instance, **kwargs):
+  bump_version('navigation_bar')
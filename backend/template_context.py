@@ -1,9 +1,13 @@
-from functools import partial
+import threading
+
 from django.conf import settings
 from django.contrib.auth.context_processors import PermWrapper
 from django.utils.functional import SimpleLazyObject, new_method_proxy
 
-from backend.utils.caniuse import CanIUse, SUPPORT
+from backend.utils.cachedict import LRUCache
+from backend.utils.caniuse import SUPPORT, get_caniuse
+from backend.utils.mathoid import mathoid_enabled
+from backend.utils.versioned_cache import get_version
 from backend.models.interface import NavigationBar
 
 class FixedSimpleLazyObject(SimpleLazyObject):
@@ -39,28 +43,73 @@ def get_resources(request):
     }
 
 def math_setting(request):
-    caniuse = CanIUse(request.META.get('HTTP_USER_AGENT', ''))
+    caniuse = get_caniuse(request.META.get('HTTP_USER_AGENT', ''))
 
     if request.user.is_authenticated:
         engine = request.user.profile.math_engine
     else:
         engine = settings.MATHOID_DEFAULT_TYPE
     if engine == 'auto':
-        engine = 'mml' if bool(settings.MATHOID_URL) and caniuse.mathml == SUPPORT else 'jax'
+        engine = 'mml' if mathoid_enabled() and caniuse.mathml == SUPPORT else 'jax'
     # print(engine)
     return {'MATH_ENGINE': engine, 'REQUIRE_JAX': engine == 'jax', 'caniuse': caniuse}
 
 
-def __nav_tab(path):
-    result = list(NavigationBar.objects.extra(where=['%s REGEXP BINARY regex'], params=[path])[:1])
-    return result[0].get_ancestors(include_self=True).values_list('key', flat=True) if result else []
+class NavigationTree(object):
+    """
+    The navigation bar, loaded once per process with the highlight pattern and ancestor keys of every item. Paths are
+    matched in Python and memoized in an LRU, and everything is reloaded when the navigation bar version changes.
+    """
+
+    version_key = 'navigation_bar'
+
+    def __init__(self, maxsize):
+        self.version = None
+        self.items = []
+        self.entries = []
+        self.tabs = LRUCache(maxsize=maxsize)
+        self.lock = threading.Lock()
+
+    def load(self):
+        # Same order as the MPTT default, so the first matching item wins as it did with the REGEXP query.
+        items = list(NavigationBar.objects.order_by('tree_id', 'lft'))
+        by_id = {item.id: item for item in items}
+        entries = []
+        for item in items:
+            keys = []
+            node = item
+            while node is not None:
+                keys.append(node.key)
+                node = by_id.get(node.parent_id)
+            entries.append((item.pattern, tuple(reversed(keys))))
+        return items, entries
+
+    def refresh(self):
+        version = get_version(self.version_key)
+        if version != self.version:
+            with self.lock:
+                if version != self.version:
+                    self.items, self.entries = self.load()
+                    self.tabs.clear()
+                    self.version = version
+        return self
+
+    def nav_tab(self, path):
+        tab = self.tabs.get(path)
+        if tab is None:
+            tab = next((keys for pattern, keys in self.entries if pattern.search(path)), ())
+            self.tabs.set(path, tab)
+        return tab
+
+
+navigation = NavigationTree(settings.NAV_TAB_CACHE_SIZE)
 
 
 def general_info(request):
     path = request.get_full_path()
     return {
-        'nav_tab': FixedSimpleLazyObject(partial(__nav_tab, request.path)),
-        'nav_bar': NavigationBar.objects.all(),
+        'nav_tab': FixedSimpleLazyObject(lambda: navigation.refresh().nav_tab(request.path)),
+        'nav_bar': FixedSimpleLazyObject(lambda: navigation.refresh().items),
         'LOGIN_RETURN_PATH': '' if path.startswith('/accounts/') else path,
         'perms': PermWrapper(request.user),
         'HAS_WEBAUTHN': bool(settings.WEBAUTHN_RP_ID),
@@ -1,4 +1,5 @@
 from django import template
+from education.bundle import TaskProblem
 from education.models import ContestProblem
 from practice.models.practice import PracticeProblem
 
@@ -6,7 +7,7 @@ register = template.Library()
 
 @register.inclusion_tag('problem/multiple_choices.html')
 def mc(problem, answers):
-  if isinstance(problem, ContestProblem) or isinstance(problem, PracticeProblem):
+  if isinstance(problem, (ContestProblem, PracticeProblem, TaskProblem)):
     markdown = problem.problem.markdown_style
   else:
     markdown = problem.markdown_style
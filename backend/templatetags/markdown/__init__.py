@@ -1,18 +1,21 @@
 import logging
 import re
+import threading
 from html import unescape
 from urllib.parse import urlparse
 
 import mistune
-from bleach.sanitizer import Cleaner
 from django.conf import settings
 from markupsafe import Markup
 from lxml import html
 from lxml.etree import ParserError, XMLSyntaxError
 
 from backend.highlight_code import highlight_code
+from backend.utils.mathoid import mathoid_enabled
 from .lazy_load import lazy_load as lazy_load_processor
 from .math import MathInlineGrammar, MathInlineLexer, MathRenderer
+from .render_cache import render_cache
+from .sanitize import TreeSanitizer
 # from judge.utils.camo import client as camo_client
 # from judge.utils.texoid import TEXOID_ENABLED, TexoidRenderer
 from .bleach_whitelist import all_styles, mathml_attrs, mathml_tags
@@ -113,13 +116,8 @@ class AwesomeRenderer(MathRenderer, mistune.Renderer):
         return super(AwesomeRenderer, self).header(text, level + 2, *args, **kwargs)
 
 
-cleaner_cache = {}
-
-
-def get_cleaner(name, params):
-    if name in cleaner_cache:
-        return cleaner_cache[name]
-
+def expand_bleach_params(params):
+    params = params.copy()
     if params.get('styles') is True:
         params['styles'] = all_styles
 
@@ -127,15 +125,28 @@ def get_cleaner(name, params):
         params['tags'] = params.get('tags', []) + mathml_tags
         params['attributes'] = params.get('attributes', {}).copy()
         params['attributes'].update(mathml_attrs)
+    return params
+
+
+sanitizer_cache = {}
+
 
-    cleaner = cleaner_cache[name] = Cleaner(**params)
-    return cleaner
+def get_sanitizer(name, params):
+    """Returns the TreeSanitizer of a markdown style, built from the bleach parameters of the style."""
+    if name in sanitizer_cache:
+        return sanitizer_cache[name]
 
+    params = expand_bleach_params(params)
+    sanitizer = sanitizer_cache[name] = TreeSanitizer(**{key: params[key] for key in
+                                                         ('tags', 'attributes', 'styles', 'protocols', 'strip')
+                                                         if key in params})
+    return sanitizer
 
-def fragments_to_tree(fragment):
+
+def fragments_to_tree(fragment, parser=None):
     tree = html.Element('div')
     try:
-        parsed = html.fragments_fromstring(fragment, parser=html.HTMLParser(recover=True))
+        parsed = html.fragments_fromstring(fragment, parser=parser or html.HTMLParser(recover=True))
     except (XMLSyntaxError, ParserError) as e:
         if fragment and (not isinstance(e, ParserError) or e.args[0] != 'Document is empty'):
             logger.exception('Failed to parse HTML string')
@@ -152,30 +163,69 @@ def fragment_tree_to_str(tree):
     return html.tostring(tree, encoding='unicode')[len('<div>'):-len('</div>')]
 
 
+class MarkdownPipeline(object):
+    """
+    A renderer, mistune parser and lxml parser built once for a markdown style and math engine. None of them are
+    safe to share between threads, so pipelines are kept per thread by get_pipeline.
+
+    The rendered HTML is parsed at most once: lazy loading and then sanitization (including the MathML whitelist)
+    both work on the same tree, which is serialized once.
+    """
+
+    def __init__(self, style, math_engine=None):
+        styles = settings.MARKDOWN_STYLES.get(style, settings.MARKDOWN_DEFAULT_STYLE)
+        escape = styles.get('safe_mode', True)
+        nofollow = styles.get('nofollow', True)
+        texoid = False
+        math = styles.get('math', False) and mathoid_enabled()
+        bleach_params = styles.get('bleach', {})
+
+        self.renderer = AwesomeRenderer(escape=escape, nofollow=nofollow, texoid=texoid,
+                                        math=math and math_engine is not None, math_engine=math_engine)
+        self.markdown = mistune.Markdown(renderer=self.renderer, inline=AwesomeInlineLexer,
+                                         parse_block_html=1, parse_inline_html=1)
+        self.sanitizer = get_sanitizer(style, bleach_params) if bleach_params else None
+        self.parser = html.HTMLParser(recover=True)
+
+    def render(self, value, lazy_load=False):
+        mathoid = self.renderer.mathoid
+        if mathoid is not None:
+            mathoid.reset()
+        result = self.markdown(value)
+        if mathoid is not None:
+            result = mathoid.substitute(result)
+
+        # The sanitizer runs last, so that it also sees whatever the other post-processors add.
+        post_processors = []
+        if lazy_load:
+            post_processors.append(lazy_load_processor)
+        if self.sanitizer is not None:
+            post_processors.append(self.sanitizer)
+
+        if post_processors:
+            tree = fragments_to_tree(result, self.parser)
+            for processor in post_processors:
+                processor(tree)
+            result = fragment_tree_to_str(tree)
+        return result
+
+
+_local = threading.local()
+
+
+def get_pipeline(style, math_engine=None):
+    pipelines = _local.__dict__.setdefault('pipelines', {})
+    pipeline = pipelines.get((style, math_engine))
+    if pipeline is None:
+        pipeline = pipelines[style, math_engine] = MarkdownPipeline(style, math_engine)
+    return pipeline
+
+
+def render_markdown(value, style, math_engine=None, lazy_load=False):
+    return get_pipeline(style, math_engine).render(value, lazy_load)
+
+
 @register.simple_tag
 def markdown(value, style, math_engine=None, lazy_load=False):
-    styles = settings.MARKDOWN_STYLES.get(style, settings.MARKDOWN_DEFAULT_STYLE)
-    escape = styles.get('safe_mode', True)
-    nofollow = styles.get('nofollow', True)
-    texoid = False
-    math = False
-    bleach_params = styles.get('bleach', {})
-
-    post_processors = []
-    if lazy_load:
-        post_processors.append(lazy_load_processor)
-
-    renderer = AwesomeRenderer(escape=escape, nofollow=nofollow, texoid=texoid,
-                               math=math and math_engine is not None, math_engine=math_engine)
-    markdown = mistune.Markdown(renderer=renderer, inline=AwesomeInlineLexer,
-                                parse_block_html=1, parse_inline_html=1)
-    result = markdown(value)
-
-    if post_processors:
-        tree = fragments_to_tree(result)
-        for processor in post_processors:
-            processor(tree)
-        result = fragment_tree_to_str(tree)
-    if bleach_params:
-        result = get_cleaner(style, bleach_params).clean(result)
+    result = render_cache.get_or_render(render_markdown, str(value or ''), style, math_engine, lazy_load)
     return mark_safe(Markup(result))
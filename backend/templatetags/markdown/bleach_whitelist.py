@@ -289,8 +289,9 @@ all_prefixed_styles = [
 
 all_styles = standard_styles + all_prefixed_styles
 
+# annotation-xml is left out: it may contain HTML, which browsers parse differently from the sanitizer (mXSS).
 mathml_tags = [
-    'abs', 'and', 'annotation', 'annotation-xml', 'apply', 'approx', 'arccos', 'arccosh', 'arccot', 'arccoth', 'arccsc',
+    'abs', 'and', 'annotation', 'apply', 'approx', 'arccos', 'arccosh', 'arccot', 'arccoth', 'arccsc',
     'arccsch', 'arcsec', 'arcsech', 'arcsin', 'arcsinh', 'arctan', 'arctanh', 'arg', 'bind', 'bvar', 'card',
     'cartesianproduct', 'cbytes', 'ceiling', 'cerror', 'ci', 'cn', 'codomain', 'complexes', 'compose', 'condition',
     'conjugate', 'cos', 'cosh', 'cot', 'coth', 'cs', 'csc', 'csch', 'csymbol', 'curl', 'declare', 'degree',
@@ -360,7 +361,6 @@ mathml_attrs = {
     'abs': ['href', 'id', 'mathbackground', 'mathcolor'],
     'and': ['href', 'id', 'mathbackground', 'mathcolor'],
     'annotation': ['href', 'id', 'mathbackground', 'mathcolor', 'encoding'],
-    'annotation-xml': ['href', 'id', 'mathbackground', 'mathcolor'],
     'apply': ['href', 'id', 'mathbackground', 'mathcolor'],
     'approx': ['href', 'id', 'mathbackground', 'mathcolor'],
     'arccos': ['href', 'id', 'mathbackground', 'mathcolor'],
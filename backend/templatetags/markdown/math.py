@@ -2,6 +2,8 @@ import re
 
 import mistune
 
+from backend.utils.mathoid import MathoidMathParser
+
 mistune._pre_tags.append('latex')
 
 
@@ -46,10 +48,11 @@ class MathInlineLexer(mistune.InlineLexer):
 
 class MathRenderer(mistune.Renderer):
     def __init__(self, *args, **kwargs):
-        # if kwargs.pop('math', False):
-        #     self.mathoid = MathoidMathParser(kwargs.pop('math_engine', None) or 'svg')
-        # else:
-        self.mathoid = None
+        # Only MathML is pre-rendered; the other engines are left to MathJax on the client.
+        if kwargs.pop('math', False) and kwargs.get('math_engine') == 'mml':
+            self.mathoid = MathoidMathParser(kwargs.pop('math_engine'))
+        else:
+            self.mathoid = None
         super(MathRenderer, self).__init__(*args, **kwargs)
 
     def block_math(self, math):
@@ -0,0 +1,59 @@
+import hashlib
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+
+from backend.utils.cachedict import LRUCache
+
+__all__ = ['RenderCache', 'render_cache']
+
+# Bump when a change to the renderer alters the output of unchanged sources.
+RENDER_VERSION = 4
+
+
+class RenderCache(object):
+    """
+    A two level cache of rendered markdown: a per-process LRU in front of the shared cache. Entries are keyed by the
+    hash of the source along with every option that changes the output, so they never need to be invalidated.
+    """
+
+    def __init__(self, alias, timeout, local_size):
+        self.alias = alias
+        self.timeout = timeout
+        self.local = LRUCache(maxsize=local_size)
+        self.stats = {'local_hits': 0, 'hits': 0, 'misses': 0}
+        self._lock = threading.Lock()
+
+    def _count(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def make_key(self, value, style, math_engine, lazy_load):
+        digest = hashlib.sha1(value.encode('utf-8')).hexdigest()
+        return 'markdown:%d:%s:%s:%s:%d' % (RENDER_VERSION, digest, style, math_engine, bool(lazy_load))
+
+    def get_or_render(self, render, value, style, math_engine=None, lazy_load=False):
+        if self.alias is None:
+            return render(value, style, math_engine, lazy_load)
+
+        key = self.make_key(value, style, math_engine, lazy_load)
+        result = self.local.get(key)
+        if result is not None:
+            self._count('local_hits')
+            return result
+
+        shared = caches[self.alias]
+        result = shared.get(key)
+        if result is not None:
+            self._count('hits')
+        else:
+            self._count('misses')
+            result = render(value, style, math_engine, lazy_load)
+            shared.set(key, result, self.timeout)
+        self.local.set(key, result)
+        return result
+
+
+render_cache = RenderCache(settings.MARKDOWN_RENDER_CACHE, settings.MARKDOWN_RENDER_CACHE_TTL,
+                           settings.MARKDOWN_RENDER_LOCAL_CACHE_SIZE)
@@ -0,0 +1,105 @@
+import re
+from urllib.parse import urlparse
+
+__all__ = ['TreeSanitizer']
+
+# Attributes whose values are URIs and must use an allowed protocol, as in bleach. data-src is included because
+# lazily loaded images move it into src on the client.
+URI_ATTRIBUTES = frozenset((
+    'action', 'background', 'cite', 'data-src', 'datasrc', 'dynsrc', 'href', 'longdesc', 'lowsrc', 'ping', 'poster',
+    'src', 'xlink:href', 'xml:base',
+))
+
+VOID_TAGS = frozenset((
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'param', 'source', 'track', 'wbr',
+))
+
+# Elements whose content the HTML parser keeps as text. Inside MathML or SVG browsers parse that content as markup
+# instead, so markup in it must never reach the output (mXSS).
+RAW_TEXT_TAGS = frozenset(('iframe', 'noembed', 'noframes', 'plaintext', 'script', 'style', 'textarea', 'title', 'xmp'))
+
+_uri_junk = re.compile(r'[`\000-\040\177-\240\s]+')
+_css_url = re.compile(r'url\s*\(\s*[^\s)]+?\s*\)\s*')
+_css_gauntlet = re.compile(r'''^([-/:,#%.'"\s!\w]|\w-\w|'[\s\w]+'\s*|"[\s\w]+"|\([\d,%\.\s]+\))*$''', re.U)
+_css_declarations = re.compile(r'^\s*([-\w]+\s*:[^:;]*(;\s*|$))*$')
+_css_declaration = re.compile(r'([-\w]+)\s*:\s*([^:;]*)')
+
+
+class TreeSanitizer(object):
+    """
+    Sanitizes an lxml fragment tree in place with the same rules as a bleach Cleaner built from the same parameters:
+    disallowed tags are escaped into text (or stripped), and disallowed attributes, unsafe URIs, disallowed CSS
+    properties and comments are removed. Allowed raw text elements such as style lose any content that looks like
+    markup. Working on the tree lets it share one parse with the other post-processors.
+    """
+
+    def __init__(self, tags=(), attributes=None, styles=(), protocols=('http', 'https', 'mailto'), strip=False):
+        self.strip = strip
+        self.tags = frozenset(tag.lower() for tag in tags)
+        attributes = attributes or {}
+        self.global_attributes = frozenset(attr.lower() for attr in attributes.get('*', ()))
+        self.attributes = {tag.lower(): frozenset(attr.lower() for attr in attrs) | self.global_attributes
+                           for tag, attrs in attributes.items() if tag != '*'}
+        self.styles = frozenset(style.lower() for style in styles)
+        self.protocols = frozenset(protocols)
+
+    def __call__(self, tree):
+        for element in list(tree.iterdescendants()):
+            if not isinstance(element.tag, str):
+                # Comments and processing instructions.
+                element.drop_tree()
+            elif element.tag.lower() not in self.tags:
+                if self.strip:
+                    element.drop_tag()
+                else:
+                    self.escape_element(element)
+            else:
+                self.clean_attributes(element)
+                if element.tag.lower() in RAW_TEXT_TAGS and '<' in (element.text or ''):
+                    element.text = ''
+
+    def escape_element(self, element):
+        start = '<%s%s>' % (element.tag, ''.join(' %s="%s"' % item for item in element.attrib.items()))
+        element.text = start + (element.text or '')
+        if element.tag.lower() not in VOID_TAGS:
+            end = '</%s>' % element.tag
+            if len(element):
+                element[-1].tail = (element[-1].tail or '') + end
+            else:
+                element.text += end
+        element.attrib.clear()
+        element.drop_tag()
+
+    def clean_attributes(self, element):
+        allowed = self.attributes.get(element.tag.lower(), self.global_attributes)
+        for name, value in list(element.attrib.items()):
+            lower = name.lower()
+            if lower not in allowed:
+                del element.attrib[name]
+            elif lower in URI_ATTRIBUTES and not self.is_safe_uri(value):
+                del element.attrib[name]
+            elif lower == 'style':
+                element.set(name, self.sanitize_css(value))
+
+    def is_safe_uri(self, value):
+        uri = _uri_junk.sub('', value).replace('\ufffd', '').lower()
+        try:
+            parsed = urlparse(uri)
+        except ValueError:
+            return False
+        if parsed.scheme:
+            return parsed.scheme in self.protocols
+        if uri.startswith('#'):
+            return True
+        if ':' in uri and uri.split(':')[0] in self.protocols:
+            return True
+        return 'http' in self.protocols
+
+    def sanitize_css(self, style):
+        style = _css_url.sub(' ', style)
+        if not all(_css_gauntlet.match(part) for part in style.split(';')):
+            return ''
+        if not _css_declarations.match(style):
+            return ''
+        return ' '.join('%s: %s;' % (prop, value) for prop, value in _css_declaration.findall(style)
+                        if value and prop.lower() in self.styles)
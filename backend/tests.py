@@ -1,3 +1,133 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from bleach.sanitizer import Cleaner
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from backend.templatetags.markdown import MarkdownPipeline, expand_bleach_params, fragment_tree_to_str, \
+    fragments_to_tree
+from backend.templatetags.markdown.sanitize import RAW_TEXT_TAGS, TreeSanitizer
+from backend.utils.mathoid import MathoidMathParser
+from backend.utils.ranker import ranker
+
+# Payloads that both sanitizers must reduce to the same markup.
+EQUIVALENT_PAYLOADS = [
+    '<script>alert(1)</script>',
+    '<img src="javascript:alert(1)" onerror="alert(1)">',
+    '<img src=x onerror=alert(1)>',
+    '<a href="jAvAsCrIpT:alert(1)">x</a>',
+    '<a href="java&#x09;script:alert(1)">x</a>',
+    '<a href="data:text/html;base64,PHNjcmlwdD5hbGVydCgxKTwvc2NyaXB0Pg==">x</a>',
+    '<a href="https://example.com/" onclick="alert(1)">x</a>',
+    '<p style="color: red; background-image: url(javascript:alert(1))">x</p>',
+    '<iframe src="javascript:alert(1)"></iframe>',
+    '<!-- <img src=x onerror=alert(1)> -->x',
+    '<math><mi>x</mi><mo>+</mo><mn>1</mn></math>',
+]
+
+# Mutation XSS payloads, which rely on the browser parsing the output differently from the sanitizer. The parsers of
+# bleach and lxml differ too, so the outputs are only checked for being safe.
+MUTATION_PAYLOADS = [
+    '<math><style><img src=x onerror=alert(1)></style></math>',
+    '<math><mtext><table><mglyph><style><img src=x onerror=alert(1)></style></mglyph></table></mtext></math>',
+    '<math><annotation-xml encoding="text/html"><img src=x onerror=alert(1)></annotation-xml></math>',
+    '<noscript><a title="</noscript><img src=x onerror=alert(1)>">x</a></noscript>',
+    '<style><img src=x onerror=alert(1)></style>',
+    '<a title="<img src=x onerror=alert(1)>">x</a>',
+    '<math><mi xlink:href="javascript:alert(1)">x</mi></math>',
+    '<svg onload=alert(1)>',
+]
+
+UNSAFE_TAGS = ('annotation-xml', 'iframe', 'script', 'svg')
+
+
+class SanitizerTestCase(SimpleTestCase):
+    def setUp(self):
+        params = expand_bleach_params(settings.MARKDOWN_STYLES['description']['bleach'])
+        self.sanitizer = TreeSanitizer(**{key: params[key] for key in ('tags', 'attributes', 'styles') if key in params})
+        self.cleaner = Cleaner(**{key: params[key] for key in ('tags', 'attributes', 'styles') if key in params})
+
+    def sanitize(self, value):
+        tree = fragments_to_tree(value)
+        self.sanitizer(tree)
+        return fragment_tree_to_str(tree)
+
+    def normalize(self, value):
+        return fragment_tree_to_str(fragments_to_tree(value))
+
+    def assertSafe(self, value):
+        # A literal < in an attribute value can close a raw text element, such as noscript, in the browser.
+        self.assertNotRegex(value, r'="[^"]*<')
+        for element in fragments_to_tree(value).iterdescendants():
+            if not isinstance(element.tag, str):
+                continue
+            self.assertNotIn(element.tag.lower(), UNSAFE_TAGS, value)
+            for name, attr in element.attrib.items():
+                self.assertFalse(name.lower().startswith('on'), value)
+                self.assertFalse(''.join(attr.split()).lower().startswith('javascript:'), value)
+            if element.tag.lower() in RAW_TEXT_TAGS:
+                self.assertNotIn('<', element.text or '', value)
+
+    def test_matches_bleach(self):
+        for payload in EQUIVALENT_PAYLOADS:
+            with self.subTest(payload=payload):
+                result = self.sanitize(payload)
+                self.assertSafe(result)
+                self.assertEqual(self.normalize(result), self.normalize(self.cleaner.clean(payload)))
+
+    def test_mutation_xss(self):
+        for payload in MUTATION_PAYLOADS:
+            with self.subTest(payload=payload):
+                self.assertSafe(self.sanitize(payload))
+                self.assertSafe(self.cleaner.clean(payload))
+
+    def test_annotation_xml_is_escaped(self):
+        self.assertNotIn('<annotation-xml', self.sanitize('<math><annotation-xml>x</annotation-xml></math>'))
+
+    def test_raw_text_markup_is_dropped(self):
+        self.assertEqual(self.sanitize('<style>p { color: red; }</style>'), '<style>p { color: red; }</style>')
+        self.assertEqual(self.sanitize('<math><style><img src=x></style></math>'), '<math><style></style></math>')
+
+
+class RankerTestCase(SimpleTestCase):
+    keys = [10, 10, 9, 9, 9, 8, 7, 7]
+
+    def ranks(self, keys, **kwargs):
+        return [rank for rank, item in ranker(keys, key=lambda item: item, **kwargs)]
+
+    def test_ranks_ties(self):
+        self.assertEqual(self.ranks(self.keys), [1, 1, 3, 3, 3, 6, 7, 7])
+
+    def test_first_page(self):
+        self.assertEqual(self.ranks(self.keys[:3], rank=1, offset=0), [1, 1, 3])
+
+    def test_page_starting_inside_tie(self):
+        self.assertEqual(self.ranks(self.keys[3:6], rank=3, offset=3), [3, 3, 6])
+
+    def test_page_starting_after_tie(self):
+        self.assertEqual(self.ranks(self.keys[5:], rank=6, offset=5), [6, 7, 7])
+
+
+class MathoidMathParserTestCase(SimpleTestCase):
+    def setUp(self):
+        self.parser = MathoidMathParser('svg')
+
+    def test_substitutes_formulas(self):
+        html = 'Let %s.' % self.parser.inline_math('x')
+        with mock.patch.object(self.parser, 'get_results', return_value={('x', False): '<math>x</math>'}):
+            self.assertEqual(self.parser.substitute(html), 'Let <span class="inline-math"><math>x</math></span>.')
+
+    def test_keeps_typed_placeholders(self):
+        typed = '\ue0009\ue001 \ue000%s:0\ue001 \ue000%s:5\ue001' % ('0' * 16, self.parser.nonce)
+        html = typed + ' ' + self.parser.inline_math('x')
+        with mock.patch.object(self.parser, 'get_results', return_value={}):
+            self.assertEqual(self.parser.substitute(html), typed + ' \\(x\\)')
+
+    def test_keeps_typed_placeholders_without_math(self):
+        self.assertEqual(self.parser.substitute('\ue0009\ue001'), '\ue0009\ue001')
+
+    def test_markdown_with_typed_placeholders(self):
+        pipeline = MarkdownPipeline('default', 'mml')
+        with mock.patch.object(MathoidMathParser, 'get_results', return_value={}):
+            result = pipeline.render('Typed \ue0009\ue001 next to ~x~')
+        self.assertIn('\ue0009\ue001', result)
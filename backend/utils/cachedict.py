@@ -1,3 +1,8 @@
+import threading
+import time
+from collections import OrderedDict
+
+
 class CacheDict(dict):
     def __init__(self, func):
         super(CacheDict, self).__init__()
@@ -6,3 +11,44 @@ class CacheDict(dict):
     def __missing__(self, key):
         self[key] = value = self.func(key)
         return value
+
+
+class LRUCache(object):
+    """A thread-safe, bounded in-process cache. Entries older than ``ttl`` seconds are treated as missing."""
+
+    def __init__(self, maxsize=128, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value, expires = self._data[key]
+            except KeyError:
+                return default
+            if expires is not None and expires < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        expires = None if self.ttl is None else time.monotonic() + self.ttl
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
@@ -1,5 +1,7 @@
 import json
 import os
+from bisect import bisect_right
+from functools import lru_cache
 
 from ua_parser import user_agent_parser
 
@@ -55,6 +57,10 @@ class BrowserFamily(object):
         self.max_version = max_version
         self.max_support = max_support
 
+        # Version ranges do not overlap, so sorting them by start lets check() bisect for the only candidate.
+        ranges.sort(key=lambda item: item[0])
+        self._starts = [start for start, end, support in ranges]
+
     def check(self, major, minor, patch):
         int_major, int_minor, int_patch = map(safe_int, (major, minor, patch))
 
@@ -68,8 +74,10 @@ class BrowserFamily(object):
             except KeyError:
                 pass
 
-        for start, end, support in self._ranges:
-            if start <= version < end:
+        index = bisect_right(self._starts, version) - 1
+        if index >= 0:
+            start, end, support = self._ranges[index]
+            if version < end:
                 return support
 
         return UNKNOWN
@@ -149,3 +157,12 @@ class CanIUse(object):
             result = self._check_feat(feat)
             setattr(self, attr, result)
             return result
+
+
+@lru_cache(maxsize=1024)
+def get_caniuse(ua):
+    """
+    Returns the CanIUse of a user agent string. Instances are shared between requests with the same user agent, so
+    the agent is parsed once and every feature is resolved once.
+    """
+    return CanIUse(ua)
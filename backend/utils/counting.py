@@ -0,0 +1,107 @@
+import hashlib
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connections
+
+__all__ = ['CountStrategy', 'estimate_count', 'default_count_strategy']
+
+logger = logging.getLogger('backend.counting')
+
+
+def _mysql_estimate(connection, queryset):
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN ' + sql, params)
+        columns = [column[0].lower() for column in cursor.description]
+        plan = [dict(zip(columns, row)) for row in cursor.fetchall()]
+    if not plan:
+        return None
+
+    # rows * filtered is the number of rows each table of the outer select passes on to the next join.
+    estimate = 1.0
+    for step in plan:
+        if step.get('id') != plan[0].get('id') or step.get('rows') is None:
+            continue
+        estimate *= step['rows'] * (step.get('filtered') or 100) / 100.0
+    return int(estimate)
+
+
+def _sqlite_estimate(connection, queryset):
+    # sqlite_stat1, filled in by ANALYZE, only knows the size of whole tables.
+    if queryset.query.where:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s ORDER BY idx IS NOT NULL LIMIT 1',
+                       [queryset.model._meta.db_table])
+        row = cursor.fetchone()
+    return int(row[0].split()[0]) if row else None
+
+
+_estimators = {
+    'mysql': _mysql_estimate,
+    'sqlite': _sqlite_estimate,
+}
+
+
+def estimate_count(queryset):
+    """Returns the query planner's estimate of the number of rows of a queryset, or None if it has none."""
+    connection = connections[queryset.db]
+    estimator = _estimators.get(connection.vendor)
+    if estimator is None:
+        return None
+    try:
+        return estimator(connection, queryset.order_by())
+    except DatabaseError:
+        logger.warning('Failed to estimate the row count of: %s', queryset.query, exc_info=True)
+        return None
+
+
+class CountStrategy(object):
+    """
+    Counts querysets for paginators without an exact COUNT(*) over large results. Results of up to ``exact_limit``
+    rows are counted exactly with a query that stops there; larger ones use the query planner's estimate where the
+    database has one, and an exact count otherwise. Counts of large results are cached for ``timeout`` seconds under
+    the normalized SQL of the query.
+    """
+
+    def __init__(self, exact_limit, timeout):
+        self.exact_limit = exact_limit
+        self.timeout = timeout
+
+    def make_key(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        digest = hashlib.sha1(('%s\0%r' % (' '.join(sql.split()), params)).encode('utf-8')).hexdigest()
+        return 'count:%s:%s' % (queryset.db, digest)
+
+    def count(self, queryset):
+        """Returns ``(count, exact)``, where exact is False if the count is an estimate."""
+        queryset = queryset.order_by()
+        key = self.make_key(queryset)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+        bounded = queryset.values('pk')[:self.exact_limit + 1].count()
+        if bounded <= self.exact_limit:
+            return bounded, True
+
+        estimate = estimate_count(queryset)
+        if estimate is not None:
+            # The probe above already saw more rows than the limit, whatever the planner thinks.
+            result = max(estimate, self.exact_limit + 1), False
+        else:
+            result = queryset.count(), True
+        cache.set(key, result, self.timeout)
+        return result
+
+    def exact_count(self, queryset):
+        """Counts a queryset exactly, replacing any cached estimate of it."""
+        queryset = queryset.order_by()
+        count = queryset.count()
+        cache.set(self.make_key(queryset), (count, True), self.timeout)
+        return count
+
+
+default_count_strategy = CountStrategy(settings.PAGINATOR_EXACT_COUNT_LIMIT, settings.PAGINATOR_COUNT_CACHE_TTL)
@@ -2,6 +2,8 @@ import math
 from functools import reduce
 
 from django.core.paginator import InvalidPage, Page, Paginator
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
 
 __all__ = (
     'InvalidPage',
@@ -35,6 +37,20 @@ class ExPaginator(Paginator):
     InvalidPage: That page number is not an integer
     """
 
+    def __init__(self, *args, **kwargs):
+        self.count_strategy = kwargs.pop('count_strategy', None)
+        self.softlimit = kwargs.pop('softlimit', False)
+        self.count_is_exact = True
+        super(ExPaginator, self).__init__(*args, **kwargs)
+
+    @cached_property
+    def count(self):
+        """Counts with ``count_strategy`` if there is one, which may only estimate the count of a large queryset."""
+        if self.count_strategy is None or not isinstance(self.object_list, QuerySet):
+            return super(ExPaginator, self).count
+        count, self.count_is_exact = self.count_strategy.count(self.object_list)
+        return count
+
     def _ensure_int(self, num, e):
         # see Django #7307
         try:
@@ -42,9 +58,11 @@ class ExPaginator(Paginator):
         except ValueError:
             raise e
 
-    def page(self, number, softlimit=False):
+    def page(self, number, softlimit=None):
+        if softlimit is None:
+            softlimit = self.softlimit
         try:
-            return super(ExPaginator, self).page(number)
+            page = super(ExPaginator, self).page(number)
         except InvalidPage as e:
             number = self._ensure_int(number, e)
             if number > self.num_pages and softlimit:
@@ -52,6 +70,14 @@ class ExPaginator(Paginator):
             else:
                 raise e
 
+        # An estimate too high leaves pages past the real end empty: count exactly and show the last real page.
+        if not page.object_list and page.number > 1 and not self.count_is_exact and softlimit:
+            self.count = self.count_strategy.exact_count(self.object_list)
+            self.count_is_exact = True
+            self.__dict__.pop('num_pages', None)
+            return self.page(min(page.number, self.num_pages), softlimit=False)
+        return page
+
 
 class DiggPaginator(ExPaginator):
     """
@@ -1,15 +1,17 @@
 import collections
 import inspect
+import re
 from math import ceil
 
 from django.core.paginator import EmptyPage, InvalidPage
 from django.http import Http404
 from django.utils.functional import cached_property
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
 from django.utils.inspect import method_has_no_args
 
 
 class InfinitePage(collections.abc.Sequence):
-    def __init__(self, object_list, number, unfiltered_queryset, page_size, pad_pages, paginator):
+    def __init__(self, object_list, number, unfiltered_queryset, page_size, pad_pages, paginator, after_up_to_pad=None):
         self.object_list = list(object_list)
         self.number = number
         self.unfiltered_queryset = unfiltered_queryset
@@ -17,6 +19,8 @@ class InfinitePage(collections.abc.Sequence):
         self.pad_pages = pad_pages
         self.num_pages = 1e3000
         self.paginator = paginator
+        if after_up_to_pad is not None:
+            self.__dict__['_after_up_to_pad'] = after_up_to_pad
 
     def __repr__(self):
         return '<Page %s of many>' % self.number
@@ -95,18 +99,25 @@ class InfinitePage(collections.abc.Sequence):
 
 class DummyPaginator:
     is_infinite = True
+    is_cursor = False
 
     def __init__(self, per_page):
         self.per_page = per_page
 
 
+class CursorPaginator(DummyPaginator):
+    is_cursor = True
+
+
 def infinite_paginate(queryset, page, page_size, pad_pages, paginator=None):
     if page < 1:
         raise EmptyPage()
-    sliced = queryset[(page - 1) * page_size:page * page_size]
-    if page > 1 and not sliced:
+    # One query fetches the page along with the padding after it, plus a row to tell whether there is more.
+    rows = list(queryset[(page - 1) * page_size:(page + pad_pages) * page_size + 1])
+    if page > 1 and not rows:
         raise EmptyPage()
-    return InfinitePage(sliced, page, queryset, page_size, pad_pages, paginator)
+    return InfinitePage(rows[:page_size], page, queryset, page_size, pad_pages, paginator,
+                        after_up_to_pad=max(len(rows) - page_size, 0))
 
 
 class InfinitePaginationMixin:
@@ -137,3 +148,182 @@ class InfinitePaginationMixin:
                 'page_number': page_number,
                 'message': str(e),
             })
+
+
+_cursor = re.compile(r'^(\d+)\.(\d+)$')
+
+
+def encode_cursor(key, number):
+    """Returns an opaque cursor pointing at the row with the given primary key, shown as page ``number``."""
+    return urlsafe_base64_encode(('%d.%d' % (key, number)).encode('ascii'))
+
+
+def decode_cursor(cursor):
+    try:
+        match = _cursor.match(urlsafe_base64_decode(cursor).decode('ascii'))
+    except (ValueError, UnicodeDecodeError):
+        match = None
+    if match is None:
+        raise InvalidPage('Invalid cursor')
+    return int(match.group(1)), max(int(match.group(2)), 1)
+
+
+class CursorPage(collections.abc.Sequence):
+    """
+    A page of a queryset ordered on a descending primary key, found by seeking past a cursor instead of with OFFSET.
+    Only the pages next to it are linked: ``links`` holds ``(number, href)`` pairs for the template, with ``False``
+    standing in for the gaps.
+    """
+
+    def __init__(self, object_list, number, page_size, pad_pages, paginator, next_keys, has_previous, has_trailing,
+                 link):
+        self.object_list = list(object_list)
+        self.number = number
+        self.page_size = page_size
+        self.pad_pages = pad_pages
+        self.num_pages = 1e3000
+        self.paginator = paginator
+        self._next_keys = next_keys
+        self._has_previous = has_previous
+        self.has_trailing = has_trailing
+        self._link = link
+
+    def __repr__(self):
+        return '<Page %s of many>' % self.number
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return bool(self._next_keys)
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self.has_previous() or self.has_next()
+
+    def next_page_number(self):
+        if not self.has_next():
+            raise EmptyPage()
+        return self.number + 1
+
+    def previous_page_number(self):
+        if not self.has_previous():
+            raise EmptyPage()
+        return max(self.number - 1, 1)
+
+    def start_index(self):
+        return (self.page_size * (self.number - 1)) + 1
+
+    def end_index(self):
+        return self.start_index() + len(self.object_list)
+
+    @cached_property
+    def previous_href(self):
+        if not self.has_previous():
+            return None
+        if self.number <= 2:
+            return self._link(None, None, 1)
+        return self._link('before', self.object_list[0].pk, self.number - 1)
+
+    @cached_property
+    def next_href(self):
+        if not self.has_next():
+            return None
+        return self._link('after', self._next_keys[0], self.number + 1)
+
+    @cached_property
+    def links(self):
+        result = []
+        if self.has_previous():
+            result.append((1, self._link(None, None, 1)))
+            if self.number > 3:
+                result.append(False)
+            if self.number > 2:
+                result.append((self.number - 1, self.previous_href))
+        result.append((self.number, None))
+        for offset, key in enumerate(self._next_keys, 1):
+            result.append((self.number + offset, self._link('after', key, self.number + offset)))
+        if self.has_trailing:
+            result.append(False)
+        return result
+
+    @cached_property
+    def page_range(self):
+        return [link and link[0] for link in self.links]
+
+
+def cursor_paginate(queryset, page_size, pad_pages, link, after=None, before=None, paginator=None):
+    """
+    Paginates a queryset ordered on ``-pk`` by keyset. ``after`` and ``before`` are cursors from the links of another
+    page; with neither, the first page is returned. A forward page is fetched with the ``pad_pages`` pages after it
+    and one more row in a single query, which tells whether those pages exist and where each of them starts.
+    """
+    if before is not None:
+        key, number = decode_cursor(before)
+        # Walk back from the cursor in ascending order; one extra row tells whether there are newer pages still.
+        rows = list(queryset.filter(pk__gt=key).reverse()[:page_size + 1])
+        if len(rows) > page_size:
+            object_list = rows[:page_size][::-1]
+            return CursorPage(object_list, max(number, 2), page_size, pad_pages, paginator,
+                              next_keys=[object_list[-1].pk], has_previous=True, has_trailing=False, link=link)
+        # Reached the newest rows: show the first page instead of a short one.
+        after = None
+
+    if after is not None:
+        key, number = decode_cursor(after)
+        queryset = queryset.filter(pk__lt=key)
+    else:
+        number = 1
+
+    rows = list(queryset[:page_size * (pad_pages + 1) + 1])
+    if after is not None and not rows:
+        raise EmptyPage()
+    object_list = rows[:page_size]
+    # Every following page starts after the last row of the one before it.
+    next_keys = [rows[offset * page_size - 1].pk for offset in range(1, max(pad_pages, 1) + 1)
+                 if len(rows) > offset * page_size]
+    return CursorPage(object_list, number, page_size, pad_pages, paginator, next_keys=next_keys,
+                      has_previous=after is not None, has_trailing=len(rows) > page_size * (pad_pages + 1), link=link)
+
+
+class CursorPaginationMixin(InfinitePaginationMixin):
+    """
+    Paginates a list view ordered on ``-pk`` with opaque ``before`` and ``after`` cursors in the query string, so that
+    deep pages cost as much as the first one. Numbered pages from old links are still served with OFFSET.
+    """
+
+    def get_cursor_link(self, direction, key, number):
+        query = self.request.GET.copy()
+        for param in ('after', 'before', self.page_kwarg):
+            query.pop(param, None)
+        if direction is not None:
+            query[direction] = encode_cursor(key, number)
+        path = self.request.path
+        if self.kwargs.get(self.page_kwarg):
+            # Cursor links replace the page number in the path.
+            path = path[:path.rstrip('/').rfind('/') + 1]
+        query = query.urlencode()
+        return '%s?%s' % (path, query) if query else path
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.use_infinite_pagination:
+            return super().paginate_queryset(queryset, page_size)
+
+        after = self.request.GET.get('after')
+        before = self.request.GET.get('before')
+        page = self.kwargs.get(self.page_kwarg) or self.request.GET.get(self.page_kwarg)
+        if after is None and before is None and page not in (None, '1'):
+            return super().paginate_queryset(queryset, page_size)
+
+        try:
+            paginator = CursorPaginator(page_size)
+            page = cursor_paginate(queryset, page_size, self.pad_pages, self.get_cursor_link,
+                                   after=after, before=before, paginator=paginator)
+            return paginator, page, page.object_list, page.has_other_pages()
+        except InvalidPage as e:
+            raise Http404('Invalid page: %s' % e)
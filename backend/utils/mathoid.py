@@ -0,0 +1,186 @@
+import hashlib
+import logging
+import os
+import re
+import secrets
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+from mistune import escape
+
+__all__ = ['MathBackend', 'LocalMathBackend', 'MathoidMathParser', 'get_math_backend', 'mathoid_enabled']
+
+logger = logging.getLogger('backend.mathoid')
+
+# Private use characters delimit formula placeholders. Users can type them too, so placeholders also carry a nonce
+# that is new for every render.
+PLACEHOLDER = '\ue000%s:%d\ue001'
+_placeholder = re.compile('\ue000([0-9a-f]+):(\\d+)\ue001')
+
+
+class MathBackend(object):
+    """Renders TeX formulas to MathML. Backends are selected with settings.MATHOID_BACKEND."""
+
+    def render_batch(self, formulas):
+        """
+        Renders a batch of formulas with a single call.
+        :param formulas: A list of (TeX string, display) tuples, where display is True for display math.
+        :return: A dict mapping every formula tuple that could be rendered to its MathML.
+        """
+        raise NotImplementedError()
+
+
+class LocalMathBackend(MathBackend):
+    """Renders in process with the pure-Python latex2mathml converter."""
+
+    def __init__(self):
+        from latex2mathml.converter import convert
+        self.convert = convert
+
+    def render_batch(self, formulas):
+        result = {}
+        for formula in formulas:
+            math, display = formula
+            try:
+                result[formula] = self.convert(math, display='block' if display else 'inline')
+            except Exception:
+                logger.warning('Failed to render formula: %s', math, exc_info=True)
+        return result
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_math_backend():
+    """Returns the configured MathBackend, or None if there is none or it cannot be loaded."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                backend = False
+                if settings.MATHOID_BACKEND:
+                    try:
+                        backend = import_string(settings.MATHOID_BACKEND)()
+                    except ImportError:
+                        logger.warning('Failed to load math backend %s', settings.MATHOID_BACKEND, exc_info=True)
+                _backend = backend
+    return _backend or None
+
+
+def mathoid_enabled():
+    return get_math_backend() is not None
+
+
+class MathoidMathParser(object):
+    """
+    Pre-renders the math of one markdown render. While the markdown renders, formulas are replaced by placeholders;
+    substitute() then renders every formula of the page with one backend call and fills them in. Rendered MathML is
+    cached by formula hash in settings.MATHOID_MML_CACHE and on disk under settings.MATHOID_CACHE_ROOT.
+    """
+
+    def __init__(self, type):
+        self.type = type
+        self.reset()
+
+    def reset(self):
+        self.formulas = []
+        self.nonce = secrets.token_hex(8)
+
+    def _placeholder(self, math, display):
+        self.formulas.append((math, display))
+        return PLACEHOLDER % (self.nonce, len(self.formulas) - 1)
+
+    def inline_math(self, math):
+        return self._placeholder(math, False)
+
+    def display_math(self, math):
+        return self._placeholder(math, True)
+
+    def _hash(self, formula):
+        math, display = formula
+        return hashlib.sha1(('%s:%s' % ('block' if display else 'inline', math)).encode('utf-8')).hexdigest()
+
+    def _cache_path(self, hash):
+        return os.path.join(settings.MATHOID_CACHE_ROOT, hash[:2], '%s.mml' % hash)
+
+    def _read_disk(self, hash):
+        if not settings.MATHOID_CACHE_ROOT:
+            return None
+        try:
+            with open(self._cache_path(hash), encoding='utf-8') as f:
+                return f.read()
+        except IOError:
+            return None
+
+    def _write_disk(self, hash, mml):
+        if not settings.MATHOID_CACHE_ROOT:
+            return
+        path = self._cache_path(hash)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                f.write(mml)
+            os.replace(path + '.tmp', path)
+        except IOError:
+            logger.warning('Failed to cache formula in %s', path, exc_info=True)
+
+    def get_results(self, formulas):
+        """Returns a dict mapping each (TeX, display) tuple to its MathML, rendering all misses in one call."""
+        hashes = {formula: self._hash(formula) for formula in set(formulas)}
+        cache = caches[settings.MATHOID_MML_CACHE] if settings.MATHOID_MML_CACHE else None
+
+        results = {}
+        if cache is not None:
+            cached = cache.get_many(['mathoid:mml:%s' % hash for hash in hashes.values()])
+            for formula, hash in hashes.items():
+                if 'mathoid:mml:%s' % hash in cached:
+                    results[formula] = cached['mathoid:mml:%s' % hash]
+
+        from_disk = {}
+        missing = []
+        for formula in hashes:
+            if formula in results:
+                continue
+            mml = self._read_disk(hashes[formula])
+            if mml is None:
+                missing.append(formula)
+            else:
+                from_disk[formula] = mml
+
+        rendered = get_math_backend().render_batch(missing) if missing else {}
+        for formula, mml in rendered.items():
+            self._write_disk(hashes[formula], mml)
+
+        fresh = from_disk
+        fresh.update(rendered)
+        if cache is not None and fresh:
+            cache.set_many({'mathoid:mml:%s' % hashes[formula]: mml for formula, mml in fresh.items()},
+                           settings.MATHOID_MML_CACHE_TTL)
+        results.update(fresh)
+        return results
+
+    def output(self, math, display, mml):
+        if mml is None:
+            return (r'\[%s\]' if display else r'\(%s\)') % escape(str(math))
+        if display:
+            return '<div class="display-math">%s</div>' % mml
+        return '<span class="inline-math">%s</span>' % mml
+
+    def substitute(self, html):
+        formulas, self.formulas = self.formulas, []
+        if not formulas:
+            return html
+        results = self.get_results(formulas)
+
+        def replace(match):
+            nonce, index = match.group(1), int(match.group(2))
+            # Anything else was typed by the user, and is left as it is.
+            if nonce != self.nonce or index >= len(formulas):
+                return match.group(0)
+            math, display = formula = formulas[index]
+            return self.output(math, display, results.get(formula))
+
+        return _placeholder.sub(replace, html)
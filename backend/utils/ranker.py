@@ -1,14 +1,21 @@
 from operator import attrgetter
 
 
-def ranker(iterable, key=attrgetter('point'), rank=0):
-    delta = 1
+def ranker(iterable, key=attrgetter('point'), rank=None, offset=0):
+    """
+    Yields (rank, item) for every item of an iterable sorted by key, giving tied items the same rank.
+
+    To rank a slice of a longer list, pass the number of items before the slice as ``offset`` and the rank of the
+    first item of the slice as ``rank``. The first item always gets that rank, so that ties spanning the start of the
+    slice keep it.
+    """
+    resume = rank is not None
     last = None
-    for item in iterable:
+    for position, item in enumerate(iterable, offset + 1):
         new = key(item)
-        if new != last:
-            rank += delta
-            delta = 0
-        delta += 1
+        if resume:
+            resume = False
+        elif new != last:
+            rank = position
         yield rank, item
-        last = key(item)
+        last = new
@@ -1,6 +1,6 @@
 from copy import copy
 
-from django.db import connections
+from django.db import DEFAULT_DB_ALIAS, connections
 from django.db.models import Field
 from django.db.models.expressions import RawSQL
 from django.db.models.sql.constants import INNER, LOUTER
@@ -94,3 +94,22 @@ def use_straight_join(queryset):
     except AttributeError:
         cloner = queryset.query.clone
     queryset.query = cloner(straight_join_cache[type(queryset.query)])
+
+
+class QueryCounter(object):
+    """Counts the queries executed on a database connection while the context is active."""
+
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.connection = connections[using]
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self.connection.execute_wrappers.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.connection.execute_wrappers.remove(self)
@@ -0,0 +1,38 @@
+import time
+
+from django.core.cache import cache
+
+__all__ = ['get_version', 'bump_version', 'versioned_get']
+
+
+def _version_key(key):
+    return '%s:version' % key
+
+
+def get_version(key):
+    """Returns the current version of a cache namespace, starting one if there is none."""
+    version = cache.get(_version_key(key))
+    if version is None:
+        # Start from the clock so that a version lost to eviction is never handed out again.
+        version = int(time.time() * 1000)
+        if not cache.add(_version_key(key), version, None):
+            version = cache.get(_version_key(key), version)
+    return version
+
+
+def bump_version(key):
+    """Moves a cache namespace to a new version, so that every value cached under the old one is ignored."""
+    try:
+        cache.incr(_version_key(key))
+    except ValueError:
+        get_version(key)
+
+
+def versioned_get(key, func, timeout):
+    """Returns the value cached under the current version of ``key``, calling ``func`` to compute it on a miss."""
+    versioned_key = '%s:%d' % (key, get_version(key))
+    value = cache.get(versioned_key)
+    if value is None:
+        value = func()
+        cache.set(versioned_key, value, timeout)
+    return value
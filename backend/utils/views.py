@@ -5,6 +5,7 @@ from django.utils.decorators import method_decorator
 from django.views.generic import FormView
 from django.views.generic.detail import SingleObjectMixin
 
+from backend.utils.counting import default_count_strategy
 from backend.utils.diggpaginator import DiggPaginator
 
 class TitleMixin(object):
@@ -84,6 +85,8 @@ class NoBatchDeleteMixin(object):
 class DiggPaginatorMixin(object):
     def get_paginator(self, queryset, per_page, orphans=0,
                       allow_empty_first_page=True, **kwargs):
+        kwargs.setdefault('count_strategy', default_count_strategy)
+        kwargs.setdefault('softlimit', True)
         return DiggPaginator(queryset, per_page, body=6, padding=2,
                              orphans=orphans, allow_empty_first_page=allow_empty_first_page, **kwargs)
 
@@ -1,10 +1,9 @@
-import os
 from django.urls import reverse, reverse_lazy
 from reversion.admin import VersionAdmin
 
 from django import forms
 from django.urls import path
-from django.http import HttpResponse
+from django.http import FileResponse
 from django.shortcuts import get_object_or_404
 from django.contrib import admin
 from django.conf import settings
@@ -13,6 +12,7 @@ from django.utils.translation import gettext, gettext_lazy as _, ngettext
 from django.utils.html import format_html
 
 from backend.models.profile import Profile
+from backend.utils.views import generic_message
 
 from backend.widgets.martor import AdminMartorWidget, MartorWidget
 
@@ -133,50 +133,22 @@ class ContestAdmin(admin.ModelAdmin):
     ] + super().get_urls()
 
   def export_word(self, request, id):
-    from education.signals import unlink_if_exists
-    from education.views.contest import get_answer_contest_problem
-    import pandoc
-    import io
+    from education.word import WordExportJob
 
     contest = get_object_or_404(Contest, id=id)
-    problems = [e.problem for e in ContestProblem.objects.select_related('problem').filter(contest=contest)]
-    file = os.path.join(settings.WORD_CONTEST_CACHE, "contest_{}.docx".format(contest.key))
-    if os.path.exists(file):
-      unlink_if_exists(file)
-    md = "# {}\r\n\r\n".format(contest.name)
-    for index, problem in enumerate(problems):
-      md += "**Problem %s**: " % (index + 1) + str(problem.description) + "\r\n\r\n"
-      if problem.answer_type == 'mc':
-        answers = get_answer_contest_problem(problem)
-        max_length = 0
-        for index, item in answers:
-          max_length = max(max_length, len(item))
-        if max_length > 30:
-          for index, item in answers:
-            md += '\t' + index + ". " + item + "\r\n"
-        else:
-          md += "+----------------------------------+-----------------------------------+\r\n"
-          i = 0
-          for index, item in answers:
-            i += 1
-            s = " **%s**. %s" % (index, item)
-            while len(s) < 34:
-              s += ' '
-            md += '\x7c' + s
-            if i % 2 == 0:
-              md += "\x7c\r\n+----------------------------------+-----------------------------------+\r\n"
-          if i % 2 == 1:
-            md += "\x7c\r\n+----------------------------------+-----------------------------------+\r\n"
-      md += "\r\n"
-      
-    md = md.replace('~', '$')
-    md = md.replace('](/', '](%s/' % settings.SITE_FULL_URL)
-    doc = pandoc.read(source=md, format='markdown')
-    pandoc.write(doc=doc, format='docx', file=file)
-    # pandoc.write(doc=doc, format='markdown', file="/tmp/%s.md" % (contest.key))
-    f = io.open(file, mode='rb')
-    response = HttpResponse(
-      f.read(),
+    job = WordExportJob(contest)
+    if not job.ready:
+      job.schedule()
+      if not job.ready:
+        response = generic_message(request, gettext('Exporting to Word'),
+                                   gettext('%s is being exported, this page will reload when it is ready.') %
+                                   contest.name, status=202)
+        response['Retry-After'] = str(settings.WORD_RETRY_AFTER)
+        response['Refresh'] = str(settings.WORD_RETRY_AFTER)
+        return response
+
+    response = FileResponse(
+      open(job.path, 'rb'),
       content_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document',
     )
     response['Content-Disposition'] = 'attachment; filename="contest_%s.docx"' % (contest.key)
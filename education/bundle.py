@@ -0,0 +1,102 @@
+import hashlib
+import random
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch
+
+from backend.utils.cachedict import LRUCache
+from education.models.contest import ContestProblem
+from education.models.problem import Answer
+
+__all__ = ['TaskProblem', 'TaskStatement', 'load_task_bundle', 'get_task_bundle', 'invalidate_task_bundles',
+           'label_answers', 'task_seed', 'shuffle_tasks']
+
+# A problem of a contest as the task pages show it. Templates treat it like a ContestProblem with its problem loaded.
+TaskProblem = namedtuple('TaskProblem', 'id order points problem answers')
+TaskStatement = namedtuple('TaskStatement', 'id description answer_type markdown_style')
+
+# The local cache cannot be invalidated from other processes, so its entries only live for a few seconds.
+_local_bundles = LRUCache(maxsize=settings.TASK_BUNDLE_LOCAL_CACHE_SIZE, ttl=settings.TASK_BUNDLE_LOCAL_CACHE_TTL)
+
+
+def _bundle_key(contest_id):
+    return 'task_bundle:%d' % contest_id
+
+
+def load_task_bundle(contest_id):
+    """
+    Returns a tuple of TaskProblem, in contest order, for every problem of a contest, using two queries however many
+    problems there are. Answers are the descriptions of the problem's answers, in creation order.
+    """
+    contest_problems = ContestProblem.objects.filter(contest_id=contest_id).order_by('order', 'id') \
+        .select_related('problem').only('id', 'order', 'points', 'problem__id', 'problem__description',
+                                        'problem__answer_type') \
+        .prefetch_related(Prefetch('problem__answers', queryset=Answer.objects.order_by('id')
+                                   .only('id', 'problem_id', 'description')))
+    return tuple(
+        TaskProblem(
+            id=contest_problem.id,
+            order=contest_problem.order,
+            points=contest_problem.points,
+            problem=TaskStatement(
+                id=contest_problem.problem.id,
+                description=contest_problem.problem.description,
+                answer_type=contest_problem.problem.answer_type,
+                markdown_style=contest_problem.problem.markdown_style,
+            ),
+            answers=tuple(answer.description for answer in contest_problem.problem.answers.all()),
+        )
+        for contest_problem in contest_problems
+    )
+
+
+def get_task_bundle(contest_id):
+    """Returns the task bundle of a contest, going to the database only on a cold cache."""
+    key = _bundle_key(contest_id)
+    bundle = _local_bundles.get(key)
+    if bundle is None:
+        bundle = cache.get(key)
+        if bundle is None:
+            bundle = load_task_bundle(contest_id)
+            cache.set(key, bundle, settings.TASK_BUNDLE_CACHE_TTL)
+        _local_bundles.set(key, bundle)
+    return bundle
+
+
+def invalidate_task_bundles(contest_ids):
+    keys = [_bundle_key(contest_id) for contest_id in contest_ids]
+    for key in keys:
+        _local_bundles.delete(key)
+    cache.delete_many(keys)
+
+
+def label_answers(answers):
+    """Pairs answer descriptions with the letters they are shown with: A, B, C..."""
+    return [(chr(idx + 65), answer) for idx, answer in enumerate(answers)]
+
+
+def task_seed(contest_id, participation_id=None):
+    """Returns the seed that orders the tasks of a participation, or of the printed contest if there is none."""
+    return hashlib.sha1(('%d:%s' % (contest_id, participation_id or 'raw')).encode('ascii')).hexdigest()
+
+
+def _task_key(seed, problem_id):
+    return hashlib.sha1(('%s:%d' % (seed, problem_id)).encode('ascii')).digest()
+
+
+def shuffle_tasks(bundle, seed):
+    """
+    Returns (TaskProblem, labelled answers) pairs for a bundle, shuffled in the order that seed gives. The order is
+    reproducible on every page load and in every process, so it only ever has to be stored as the seed. Problems are
+    sorted by a hash of the seed and their id, so adding or removing a problem keeps the relative order of the others,
+    and answers are shuffled per problem, so editing one problem does not reorder the answers of the others.
+    """
+    problems = sorted(bundle, key=lambda problem: _task_key(seed, problem.id))
+    tasks = []
+    for problem in problems:
+        answers = list(problem.answers)
+        random.Random('%s:%d' % (seed, problem.id)).shuffle(answers)
+        tasks.append((problem, label_answers(answers)))
+    return tasks
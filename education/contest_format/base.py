@@ -19,11 +19,24 @@ class BaseContestFormat(six.with_metaclass(ABCMeta)):
     def update_participation(self, participation):
         """
         Updates a ContestParticipation object's score, cumtime, and format_data fields based on this contest format.
-        Implementations should call ContestParticipation.save().
-        :param participation: A ContestParticipation object.
+        Implementations should call ContestParticipation.save(update_fields=ContestParticipation.RESULT_FIELDS).
+        :param participation: A ContestParticipation object, locked for update by the caller.
         :return: None
         """
         raise NotImplementedError()
+
+    def update_submission(self, participation, submission):
+        """
+        Updates a ContestParticipation object's score, cumtime, and format_data fields after a single new submission
+        was graded, without rescoring the participation's other submissions. Formats that can not do this
+        incrementally fall back to update_participation.
+        Implementations should call ContestParticipation.save(update_fields=ContestParticipation.RESULT_FIELDS) if
+        anything changed.
+        :param participation: A ContestParticipation object, locked for update by the caller.
+        :param submission: The newly graded Submission object of this participation.
+        :return: None
+        """
+        self.update_participation(participation)
     
     @abstractmethod
     def display_user_problem(self, participation, contest_problem):
@@ -1,6 +1,6 @@
 from datetime import timedelta
 from django.utils.translation import gettext_lazy
-from django.db.models import Max
+from django.db.models import Sum
 from django.utils.html import format_html
 from django.utils.safestring import mark_safe
 from django.template.defaultfilters import floatformat
@@ -18,40 +18,39 @@ class DefaultContestFormat(BaseContestFormat):
         super().__init__(contest)
     
     def update_participation(self, participation):
-        cumtime = 0
-        format_data = {}
-
-        max_points = 0
-        problems = participation.contest.contest_problems.all()
-        for problem in problems:
-            max_points += problem.points
+        max_points = participation.contest.contest_problems.aggregate(total=Sum('points'))['total'] or 0
         
         for submission in participation.submissions.all():
             if submission.max_points != max_points:
                 submission.judge()
 
-        sub = participation.submissions.aggregate(point=Max('points'))
-
-        submission = participation.submissions.filter(points=sub['point']).order_by('date').first()
+        submission = participation.submissions.order_by('-points', 'date').first()
+        self._update_from_best_submission(participation, submission)
 
-        # print(sub)
+    def update_submission(self, participation, submission):
+        if not submission.max_points:
+            return
+        # Later submissions only replace the stored best one if they are strictly better.
+        score = round(submission.points * 100 / submission.max_points, self.contest.points_precision)
+        if participation.format_data and score <= participation.score:
+            return
+        self._update_from_best_submission(participation, submission)
 
-
-        dt = (submission.date - participation.start).total_seconds()
-        cumtime += dt
-        
-        for sub_problem in submission.problems.all():
-            # print(sub_problem.problem.id)
-            format_data[str(sub_problem.problem.id)] = {'status': sub_problem.result}
-        
-        participation.cumtime = max(cumtime, 0)
-        participation.score = round(submission.points * 100 / max_points, self.contest.points_precision)
+    def _update_from_best_submission(self, participation, submission):
+        if submission is None or not submission.max_points:
+            participation.cumtime = 0
+            participation.score = 0
+            participation.format_data = {}
+        else:
+            participation.cumtime = max((submission.date - participation.start).total_seconds(), 0)
+            participation.score = round(submission.points * 100 / submission.max_points,
+                                        self.contest.points_precision)
+            participation.format_data = {
+                str(problem_id): {'status': result}
+                for problem_id, result in submission.problems.values_list('problem_id', 'result')
+            }
         participation.tiebreaker = 0
-        participation.format_data = format_data
-
-        # print(format_data)
-        
-        participation.save()
+        participation.save(update_fields=participation.RESULT_FIELDS)
     
     def display_user_problem(self, participation, contest_problem):
         # print('display_user_problem')
@@ -0,0 +1,146 @@
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+
+from backend.utils.cachedict import LRUCache
+from backend.utils.raw_sql import QueryCounter
+from education.models.contest import ContestProblem
+from education.models.problem import Answer
+
+__all__ = ['load_answer_key', 'get_contest_answer_key', 'get_problem_answer_key', 'invalidate_answer_keys',
+           'grade_submission_problems', 'ingest_answers']
+
+logger = logging.getLogger('education.grading')
+
+# The local cache cannot be invalidated from other processes, so its entries only live for a few seconds.
+_local_answer_keys = LRUCache(maxsize=settings.ANSWER_KEY_LOCAL_CACHE_SIZE, ttl=settings.ANSWER_KEY_LOCAL_CACHE_TTL)
+
+
+def _contest_key(contest_id):
+    return 'answer_key:contest:%d' % contest_id
+
+
+def _problem_key(problem_id):
+    return 'answer_key:problem:%d' % problem_id
+
+
+def load_answer_key(problem_ids):
+    """
+    Returns a dict mapping every problem id in ``problem_ids`` to an ``(answer_type, accepted answer)`` tuple,
+    using a single query. Multiple-choice problems accept their correct answer, fill-in problems their first answer.
+    """
+    answer_key = {}
+    answers = Answer.objects.filter(problem_id__in=problem_ids) \
+                            .filter(Q(is_correct=True) | Q(problem__answer_type='fill')) \
+                            .order_by('id').values_list('problem_id', 'problem__answer_type', 'description')
+    for problem_id, answer_type, description in answers:
+        answer_key.setdefault(problem_id, (answer_type, description))
+    return answer_key
+
+
+def get_contest_answer_key(contest_id):
+    """Returns the answer key of every problem in a contest, going to the database only on a cold cache."""
+    key = _contest_key(contest_id)
+    answer_key = _local_answer_keys.get(key)
+    if answer_key is None:
+        answer_key = cache.get(key)
+        if answer_key is None:
+            answer_key = load_answer_key(ContestProblem.objects.filter(contest_id=contest_id).values('problem_id'))
+            cache.set(key, answer_key, settings.ANSWER_KEY_CACHE_TTL)
+        _local_answer_keys.set(key, answer_key)
+    return answer_key
+
+
+def get_problem_answer_key(problem_ids):
+    """Returns the answer key of the given problems, loading all cache misses with one query."""
+    answer_key = {}
+    missing = []
+    for problem_id in problem_ids:
+        entry = _local_answer_keys.get(_problem_key(problem_id))
+        if entry is None:
+            missing.append(problem_id)
+        else:
+            answer_key[problem_id] = entry
+
+    if missing:
+        cached = cache.get_many([_problem_key(problem_id) for problem_id in missing])
+        loaded = load_answer_key([problem_id for problem_id in missing if _problem_key(problem_id) not in cached])
+        cache.set_many({_problem_key(problem_id): entry for problem_id, entry in loaded.items()},
+                       settings.ANSWER_KEY_CACHE_TTL)
+        for problem_id in missing:
+            entry = cached.get(_problem_key(problem_id)) or loaded.get(problem_id)
+            if entry is not None:
+                _local_answer_keys.set(_problem_key(problem_id), entry)
+                answer_key[problem_id] = entry
+    return answer_key
+
+
+def invalidate_answer_keys(problem_ids=(), contest_ids=()):
+    keys = [_problem_key(problem_id) for problem_id in problem_ids] + \
+           [_contest_key(contest_id) for contest_id in contest_ids]
+    for key in keys:
+        _local_answer_keys.delete(key)
+    cache.delete_many(keys)
+
+
+def grade_submission_problems(rows, problem_id, points, answer_key=None):
+    """
+    Grades a list of submission problem rows in memory and saves them with one bulk_update.
+    :param rows: SubmissionProblem objects of a single submission.
+    :param problem_id: A callable returning the id of the Problem a row answers.
+    :param points: A callable returning the points a row is worth when correct.
+    :param answer_key: A dict as returned by load_answer_key, looked up for the rows if not given.
+    :return: The total points granted.
+    """
+    if not rows:
+        return 0
+    if answer_key is None:
+        answer_key = get_problem_answer_key({problem_id(row) for row in rows})
+
+    total = 0
+    for row in rows:
+        entry = answer_key.get(problem_id(row))
+        row.result = entry is not None and entry[1] == row.output
+        row.points = points(row) if row.result else 0
+        total += row.points
+
+    type(rows[0]).objects.bulk_update(rows, ['result', 'points'])
+    return total
+
+
+def ingest_answers(model, submission, problems, answers, prefix='answer_'):
+    """
+    Saves the answer to every problem answered in a form post as a submission problem row, using a constant number
+    of queries: new rows are inserted with one bulk_create, and rows that already exist get the new answer with one
+    bulk_update.
+    :param model: The SubmissionProblem model to create rows of.
+    :param submission: The submission the answers belong to.
+    :param problems: An iterable of the contest or practice problems that can be answered.
+    :param answers: A mapping of ``prefix + problem id`` to the answer, usually request.POST.
+    :return: A tuple of the number of answers saved and the number of queries used.
+    """
+    with QueryCounter() as counter:
+        existing = {row.problem_id: row for row in
+                    model.objects.filter(submission=submission).only('id', 'problem_id', 'output')}
+        created = []
+        updated = []
+        for problem in problems:
+            output = answers.get(prefix + str(problem.id))
+            if output is None:
+                continue
+            row = existing.get(problem.id)
+            if row is None:
+                created.append(model(submission=submission, problem=problem, output=output))
+            elif row.output != output:
+                row.output = output
+                updated.append(row)
+        if created:
+            # A row inserted concurrently since the query above is kept through the unique constraint.
+            model.objects.bulk_create(created, ignore_conflicts=True)
+        if updated:
+            model.objects.bulk_update(updated, ['output'])
+    count = len(created) + len(updated)
+    logger.debug('Ingested %d answers of submission %d in %d queries', count, submission.id, counter.count)
+    return count, counter.count
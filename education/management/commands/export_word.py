@@ -0,0 +1,53 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from education.models.contest import Contest
+from education.word import WordExportJob, prefetch_word_problems, write_docx
+
+
+class Command(BaseCommand):
+    help = 'exports contests to Word in parallel, skipping those whose cached document is up to date'
+
+    def add_arguments(self, parser):
+        parser.add_argument('keys', nargs='*', help='keys of the contests to export, all contests if none are given')
+        parser.add_argument('-j', '--processes', type=int, default=None,
+                            help='number of pandoc processes, one per CPU by default')
+        parser.add_argument('-f', '--force', action='store_true', help='export even if the document is up to date')
+
+    def handle(self, *args, **options):
+        contests = Contest.objects.order_by('id')
+        if options['keys']:
+            contests = contests.filter(key__in=options['keys'])
+        contests = list(contests.only('id', 'key', 'name'))
+        if options['keys'] and len(contests) != len(set(options['keys'])):
+            missing = set(options['keys']) - {contest.key for contest in contests}
+            raise CommandError('no such contests: %s' % ', '.join(sorted(missing)))
+
+        # The markdown is built here from one prefetched query; the pool only runs pandoc, which needs no database.
+        problems = prefetch_word_problems(contests)
+        jobs = [WordExportJob(contest, problems.get(contest.id, [])) for contest in contests]
+        jobs = [job for job in jobs if options['force'] or not job.ready]
+        if not jobs:
+            self.stdout.write('All documents are up to date.')
+            return
+
+        # Forked workers must not share the database connections of this process.
+        connections.close_all()
+        failed = 0
+        with ProcessPoolExecutor(max_workers=options['processes']) as executor:
+            futures = {executor.submit(write_docx, job.markdown(), job.path): job for job in jobs}
+            for future in as_completed(futures):
+                job = futures[future]
+                try:
+                    future.result()
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write('Failed to export %s: %s' % (job.contest.key, e))
+                else:
+                    job.remove_old_versions()
+                    self.stdout.write('Exported %s to %s' % (job.contest.key, job.path))
+
+        if failed:
+            raise CommandError('%d of %d exports failed' % (failed, len(jobs)))
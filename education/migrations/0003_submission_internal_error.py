@@ -0,0 +1,18 @@
+# Generated by Django 3.2.21 on 2026-10-18 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('education', '0002_category_course_theory'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='submission',
+            name='result',
+            field=models.CharField(blank=True, choices=[('AC', 'Accepted'), ('WA', 'Wrong Answer'), ('PE', 'Pending'), ('IE', 'Internal Error')], db_index=True, default=None, max_length=3, null=True, verbose_name='result'),
+        ),
+    ]
@@ -1,3 +1,6 @@
+from collections import namedtuple
+
+from django.conf import settings
 from django.db import models, transaction
 from django.core.validators import RegexValidator, MinValueValidator, MaxValueValidator
 from django.core.exceptions import ValidationError
@@ -5,12 +8,18 @@ from django.urls import reverse
 from django.utils.translation import gettext_lazy as _, gettext
 from django.utils.functional import cached_property
 from django.utils import timezone
-from django.db.models import Q, F
+from django.db.models import Exists, OuterRef, Q, F
 
 from backend.models import Profile, Organization, User
+from backend.utils.versioned_cache import versioned_get
 from .problem import Problem
 from education import contest_format
 
+ContestAccess = namedtuple('ContestAccess', 'see_private is_editor view_scoreboard is_private_contestant '
+                                            'in_organization has_live_participation')
+
+NO_CONTEST_ACCESS = ContestAccess(False, False, False, False, False, False)
+
 
 class Contest(models.Model):
     SCOREBOARD_VISIBLE = 'V'
@@ -134,19 +143,26 @@ class Contest(models.Model):
         else:
             return None
 
+    def _load_editor_ids(self):
+        authors = frozenset(Contest.authors.through.objects.filter(contest=self).values_list('profile_id', flat=True))
+        curators = Contest.curators.through.objects.filter(contest=self).values_list('profile_id', flat=True)
+        return authors, authors.union(curators)
+
+    @cached_property
+    def _editor_id_sets(self):
+        return versioned_get('contest_editors:%d' % self.id, self._load_editor_ids, settings.EDITOR_IDS_CACHE_TTL)
+
     @cached_property
     def author_ids(self):
-        return Contest.authors.through.objects.filter(contest=self).values_list('profile_id', flat=True)
+        return self._editor_id_sets[0]
     
     @cached_property
     def editor_ids(self):
-        return self.author_ids.union(
-            Contest.curators.through.objects.filter(contest=self).values_list('profile_id', flat=True)
-        )
+        return self._editor_id_sets[1]
 
     def update_user_count(self):
         self.user_count = self.users.filter(virtual=0).count()
-        self.save()
+        self.save(update_fields=['user_count'])
 
     update_user_count.alters_data = True
 
@@ -156,6 +172,45 @@ class Contest(models.Model):
     class PrivateContest(Exception):
         pass
 
+    def _load_access(self, user: User):
+        profile_id = user.profile.id
+        flags = Contest.objects.filter(id=self.id).annotate(
+            view_scoreboard=Exists(Contest.view_contest_scoreboard.through.objects.filter(
+                contest=OuterRef('pk'), profile_id=profile_id)),
+            is_private_contestant=Exists(Contest.private_contestants.through.objects.filter(
+                contest=OuterRef('pk'), profile_id=profile_id)),
+            in_organization=Exists(Contest.organizations.through.objects.filter(
+                contest=OuterRef('pk'),
+                organization_id__in=Profile.organizations.through.objects.filter(profile_id=profile_id)
+                                                                     .values('organization_id'))),
+            has_live_participation=Exists(ContestParticipation.objects.filter(
+                contest=OuterRef('pk'), user_id=profile_id, virtual=ContestParticipation.LIVE)),
+        ).values('view_scoreboard', 'is_private_contestant', 'in_organization',
+                 'has_live_participation').first()
+        if flags is None:
+            return NO_CONTEST_ACCESS
+        return ContestAccess(
+            see_private=user.has_perm('education.see_private_contest') or user.has_perm('education.edit_all_contest'),
+            is_editor=profile_id in self.editor_ids,
+            view_scoreboard=flags['view_scoreboard'],
+            is_private_contestant=flags['is_private_contestant'],
+            in_organization=flags['in_organization'],
+            has_live_participation=flags['has_live_participation'],
+        )
+
+    def get_access(self, user: User):
+        """
+        Returns the ContestAccess flags of a user for this contest. They are computed with one query and memoized on
+        the user object, so every permission check on the same request reuses them.
+        """
+        if not user.is_authenticated:
+            return NO_CONTEST_ACCESS
+        cache = user.__dict__.setdefault('_contest_access_cache', {})
+        access = cache.get(self.id)
+        if access is None:
+            access = cache[self.id] = self._load_access(user)
+        return access
+
     def access_check(self, user: User):
         if not user.is_authenticated:
             if not self.is_visible:
@@ -163,13 +218,13 @@ class Contest(models.Model):
             if self.is_private or self.is_organization_private:
                 raise self.PrivateContest()
             return
-        
-        profile = user.profile
 
-        if user.has_perm('education.see_private_contest') or user.has_perm('education.edit_all_contest'):
+        access = self.get_access(user)
+
+        if access.see_private:
             return
         
-        if profile.id in self.editor_ids:
+        if access.is_editor:
             return
         
         if not self.is_visible:
@@ -178,11 +233,11 @@ class Contest(models.Model):
         if not self.is_private and not self.is_organization_private:
             return
 
-        if self.view_contest_scoreboard.filter(id=profile.id).exists():
+        if access.view_scoreboard:
             return
 
-        in_org = self.organizations.filter(id__in=profile.organizations.all()).exists()
-        in_users = self.private_contestants.filter(id=profile.id).exists()
+        in_org = access.in_organization
+        in_users = access.is_private_contestant
 
         if self.is_private and not self.is_organization_private:
             if in_users:
@@ -203,11 +258,8 @@ class Contest(models.Model):
             return True
         
     def has_completed_contest(self, user: User):
-        if user.is_authenticated:
-            participation = self.users.filter(virtual=ContestParticipation.LIVE, user=user.profile).first()
-            if participation and participation.ended:
-                return True
-        return False
+        # A live participation ends with the contest.
+        return self.ended and self.get_access(user).has_live_participation
 
     @cached_property
     def show_scoreboard(self):
@@ -220,7 +272,8 @@ class Contest(models.Model):
 
     def is_in_contest(self, user: User):
         if user.is_authenticated:
-            return user and user.profile.current_contest is not None and user.profile.current_contest.contest == self
+            participation = user.profile.current_contest
+            return participation is not None and participation.contest_id == self.id
         return False
 
     def can_see_own_scoreboard(self, user: User):
@@ -237,11 +290,8 @@ class Contest(models.Model):
             return True
         if not user.is_authenticated:
             return False
-        if user.has_perm('education.see_private_contest') or user.has_perm('education.edit_all_contest'):
-            return True
-        if user.id in self.editor_ids:
-            return True
-        if self.view_contest_scoreboard.filter(id=user.profile.id).exists():
+        access = self.get_access(user)
+        if access.see_private or access.is_editor or access.view_scoreboard:
             return True
         if self.scoreboard_visibility == self.SCOREBOARD_AFTER_PARTICIPATION and self.has_completed_contest(user):
             return True
@@ -273,7 +323,7 @@ class Contest(models.Model):
         if user.has_perm('education.edit_all_contest'):
             return True
         
-        if user.has_perm('education.edit_own_contest') and user.profile.id in self.editor_ids:
+        if user.has_perm('education.edit_own_contest') and self.get_access(user).is_editor:
             return True
         
         return False
@@ -313,16 +363,44 @@ class ContestParticipation(models.Model):
                                 help_text=_('0 means non-virtual, otherwise the n-th virtual participation.'))
     format_data = models.JSONField(_("contest format specific data"), null=True, blank=True)
 
+    # Fields written by contest formats when scoring a participation.
+    RESULT_FIELDS = ('score', 'cumtime', 'tiebreaker', 'format_data')
+
+    def _lock(self):
+        """
+        Returns a fresh copy of this participation with its row locked until the end of the current transaction, so
+        that concurrent gradings and admin changes are applied one after another instead of overwriting each other.
+        """
+        participation = ContestParticipation.objects.select_for_update().get(pk=self.pk)
+        participation.contest = self.contest
+        return participation
+
+    def _refresh_results(self, participation):
+        for field in self.RESULT_FIELDS + ('is_disqualified',):
+            setattr(self, field, getattr(participation, field))
+
     def recompute_results(self):
         with transaction.atomic():
-            self.contest.format.update_participation(self)
-            if self.is_disqualified:
-                self.score = -9999
-                self.save(update_fields=['score'])
+            participation = self._lock()
+            self.contest.format.update_participation(participation)
+            if participation.is_disqualified:
+                participation.score = -9999
+                participation.save(update_fields=['score'])
+        self._refresh_results(participation)
     recompute_results.alters_data = True
 
+    def update_results(self, submission):
+        with transaction.atomic():
+            participation = self._lock()
+            if participation.is_disqualified:
+                return
+            self.contest.format.update_submission(participation, submission)
+        self._refresh_results(participation)
+    update_results.alters_data = True
+
     def set_disqualified(self, disqualified):
         self.is_disqualified = disqualified
+        self.save(update_fields=['is_disqualified'])
         self.recompute_results()
         if self.is_disqualified:
             if self.user.current_contest == self:
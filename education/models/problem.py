@@ -9,6 +9,7 @@ from django.core.exceptions import ValidationError
 
 from backend.models import Profile, Organization
 from backend.models.profile import User
+from backend.utils.versioned_cache import versioned_get
 
 def disallowed_characters_validator(text):
     common_disallowed_characters = set(text) & settings.PROBLEM_STATEMENT_DISALLOWED_CHARACTERS
@@ -159,9 +160,12 @@ class Problem(models.Model):
         
         return cls.objects.filter(q)
 
+    def _load_author_ids(self):
+        return frozenset(Problem.authors.through.objects.filter(problem=self).values_list('profile_id', flat=True))
+
     @cached_property
     def author_ids(self):
-        return Problem.authors.through.objects.filter(problem=self).values_list('profile_id', flat=True)
+        return versioned_get('problem_authors:%d' % self.id, self._load_author_ids, settings.EDITOR_IDS_CACHE_TTL)
 
     def is_accessible_by(self, user: User, skip_contest_problem_check=False):
         # If we don't want to check if the user is in a contest containing that problem.
@@ -1,22 +1,31 @@
+import hashlib
+import hmac
+from operator import attrgetter
+
+from django.conf import settings
 from django.db import models
+from django.db.models import Sum
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.utils.html import format_html
 from django.utils.functional import cached_property
 
-from education.models.problem import Answer
+from education.grading import get_contest_answer_key, grade_submission_problems
+from education.models.contest import ContestProblem
 
 SUBMISSION_RESULT = (
     ('AC', _('Accepted')),
     ('WA', _('Wrong Answer')),
-    ('PE', _('Pending'))
+    ('PE', _('Pending')),
+    ('IE', _('Internal Error')),
 )
 
 RESULT_CLASS = {
     'AC': 'accept',
     'WA': ['wrong3', 'wrong5', 'wrong7', 'wrong9', 'pre_accept'],
-    'PE': 'pending'
+    'PE': 'pending',
+    'IE': 'pending',
 }
 
 WRONG_LEVEL = (0.3, 0.5, 0.7, 0.9, 1)
@@ -28,7 +37,7 @@ def get_result_html(result: str, index: int, point: float):
     return format_html('<td class="center aligned {style}"><div class="ui header">{point}'
                         '</div></td>',
         style=style[index] if result == 'WA' else style,
-        point=round(point, 2) if result != 'PE' else '---',
+        point=round(point, 2) if result not in ('PE', 'IE') else '---',
         # result=result
     )
 
@@ -77,27 +86,33 @@ class Submission(models.Model):
     def get_absolute_url(self):
         return reverse("submission_status", kwargs={"pk": self.pk})
 
+    @classmethod
+    def get_id_secret(cls, sub_id):
+        return (hmac.new(settings.EVENT_DAEMON_SUBMISSION_KEY.encode(), b'%d' % sub_id, hashlib.sha512)
+                .hexdigest()[:16] + '%08x' % sub_id)
+
+    @cached_property
+    def id_secret(self):
+        return self.get_id_secret(self.id)
+
     def judge(self):
-        self.points = 0.0
-        self.max_points = 0.0
         if self.is_contest:
-            for problem in self.contest.contest_problems.all():
-                self.max_points += problem.points
-            for problem in self.problems.all():
-                problem.calculator()
-                self.points += problem.points
-            self.result = 'AC' if self.points == self.max_points else 'WA'
+            self.max_points = ContestProblem.objects.filter(contest_id=self.contest_id).aggregate(total=Sum('points'))['total'] or 0
+            self.points = grade_submission_problems(list(self.problems.select_related('problem')),
+                                                    problem_id=attrgetter('problem.problem_id'),
+                                                    points=attrgetter('problem.points'),
+                                                    answer_key=get_contest_answer_key(self.contest_id))
         else:
             self.max_points = 100
-            for problem in self.problems.all():
-                problem.calculatorTask()
-                self.points += problem.points
-            self.result = 'AC' if self.points == 100 else 'WA'
+            self.points = grade_submission_problems(list(self.problems.all()),
+                                                    problem_id=attrgetter('task_id'),
+                                                    points=lambda row: 100)
+        self.result = 'AC' if self.points == self.max_points else 'WA'
         self.save(update_fields=['points', 'max_points', 'result'])
     judge.alters_data = True
     
     def update_contest(self):
-        self.user.recompute_results()
+        self.user.update_results(self)
 
     class Meta:
         permissions = (
@@ -117,32 +132,6 @@ class SubmissionProblem(models.Model):
     points = models.FloatField(_("points granted"), null=True)
     output = models.TextField(_("student's answer"), blank=True)
 
-    def calculator(self):
-        if self.problem.problem.answer_type == 'mc':
-            answer = Answer.objects.get(problem=self.problem.problem, is_correct=True)
-        if self.problem.problem.answer_type == 'fill':
-            answer = Answer.objects.filter(problem=self.problem.problem).first()
-        self.result = answer.description == self.output
-        if self.result:
-            self.points = self.problem.points
-        else:
-            self.points = 0
-        self.save(update_fields=['result', 'points'])
-    calculator.alters_data = True
-    
-    def calculatorTask(self):
-        if self.task.answer_type == 'mc':
-            answer = Answer.objects.get(problem=self.task, is_correct=True)
-        if self.task.answer_type == 'fill':
-            answer = Answer.objects.filter(problem=self.task).first()
-        self.result = answer.description == self.output
-        if self.result:
-            self.points = 100
-        else:
-            self.points = 0
-        self.save(update_fields=['result', 'points'])
-    calculatorTask.alters_data = True
-
     @cached_property
     def get_long_status(self):
         if self.result:
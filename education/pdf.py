@@ -0,0 +1,199 @@
+import hashlib
+import logging
+import os
+import random
+import shutil
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import get_template
+
+from backend.pdf import DefaultPdfMaker
+from education.bundle import get_task_bundle, shuffle_tasks, task_seed
+
+__all__ = ['ContestPdfJob', 'get_raw_context', 'get_pdf_digest', 'sweep_pdf_cache']
+
+logger = logging.getLogger('education.problem.pdf')
+
+# Bump when contest/raw.html, the print order or the answer labels change, so that every contest gets a new PDF.
+PDF_VERSION = 3
+
+# Serving a PDF marks it as used, at most this often, for the LRU sweep.
+TOUCH_INTERVAL = 3600
+
+# Builds write here before moving the PDF into place; the URL renderer always appends .pdf to the name.
+TEMP_SUFFIXES = ('.tmp', '.tmp.pdf')
+
+
+def get_raw_context(contest):
+    """Returns the template context of contest/raw.html: the problems of the contest with their answers, in print order."""
+    return {
+        'contest': contest,
+        'problems': shuffle_tasks(get_task_bundle(contest.id), task_seed(contest.id)),
+        'math_engine': 'jax',
+        'version': random.randint(1, 1000000000),
+    }
+
+
+def get_pdf_digest(contest):
+    """
+    Returns a hash of everything the PDF of a contest is rendered from: its name, its problem label script, the
+    descriptions of its problems in order and their answers. The print order is seeded by the contest alone, so contests whose statement did not
+    change keep their PDF.
+    """
+    hash = hashlib.sha1()
+    hash.update(('%d\0%s\0%s\0' % (PDF_VERSION, contest.name, contest.problem_label_script)).encode('utf-8'))
+    for problem in get_task_bundle(contest.id):
+        hash.update(('%d\0%s\0%d\0%s\0' % (problem.id, problem.order, problem.problem.id,
+                                              problem.problem.description)).encode('utf-8'))
+        for answer in problem.answers:
+            hash.update(('%s\0' % answer).encode('utf-8'))
+    return hash.hexdigest()[:16]
+
+
+def sweep_pdf_cache(max_size=None, max_age=None):
+    """
+    Removes PDFs from settings.PDF_PROBLEM_CACHE in least recently used order: those not served for max_age seconds,
+    then the oldest until the cache fits in max_size bytes. PDFs of edited contests are never served again, so this
+    is what deletes them. Temporary files left behind by builds that crashed are removed too. Returns the number of
+    files removed.
+    """
+    max_size = settings.PDF_CACHE_MAX_SIZE if max_size is None else max_size
+    max_age = settings.PDF_CACHE_MAX_AGE if max_age is None else max_age
+
+    now = time.time()
+    files = []
+    stale = []
+    with os.scandir(settings.PDF_PROBLEM_CACHE) as entries:
+        for entry in entries:
+            if not entry.is_file():
+                continue
+            # A build still running holds its lock for at most PDF_JOB_TIMEOUT, so older files are orphans.
+            if entry.name.endswith(TEMP_SUFFIXES):
+                if entry.stat().st_mtime < now - settings.PDF_JOB_TIMEOUT:
+                    stale.append(entry.path)
+            elif entry.name.endswith('.pdf'):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+    files.sort(reverse=True)
+
+    removed = 0
+    for path in stale:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            continue
+        removed += 1
+
+    cutoff = now - max_age
+    total = 0
+    for used, size, path in files:
+        total += size
+        if used >= cutoff and total <= max_size:
+            continue
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            continue
+        total -= size
+        removed += 1
+    return removed
+
+
+class ContestPdfJob(object):
+    """
+    Builds the statement PDF of a contest in the background. A lock in the shared cache makes sure at most one build
+    of a contest runs at a time, however many requests ask for it; the lock expires after settings.PDF_JOB_TIMEOUT in
+    case a worker dies in the middle of a build.
+
+    PDFs are named by the digest of their inputs, so editing a contest never needs to delete anything: the next
+    request simply asks for a file that does not exist yet.
+    """
+
+    def __init__(self, contest, digest=None):
+        self.contest = contest
+        self.digest = digest or get_pdf_digest(contest)
+
+    @property
+    def filename(self):
+        return '%s.%s.pdf' % (self.contest.key, self.digest)
+
+    @property
+    def path(self):
+        return os.path.join(settings.PDF_PROBLEM_CACHE, self.filename)
+
+    @property
+    def lock_key(self):
+        return 'contest_pdf:%d:%s:lock' % (self.contest.id, self.digest)
+
+    @property
+    def ready(self):
+        return os.path.exists(self.path)
+
+    @property
+    def running(self):
+        return cache.get(self.lock_key) is not None
+
+    def schedule(self):
+        """Queues a build unless one is already running. Returns whether a build was queued."""
+        from education.tasks import build_contest_pdf
+
+        if not cache.add(self.lock_key, True, settings.PDF_JOB_TIMEOUT):
+            return False
+        try:
+            build_contest_pdf.delay(self.contest.id, self.digest)
+        except Exception:
+            cache.delete(self.lock_key)
+            raise
+        return True
+
+    def run(self):
+        """Builds the PDF while holding the lock taken by schedule(), releasing it when done."""
+        try:
+            # If the contest was edited since the build was queued, the next request will ask for the new version.
+            if not self.ready and get_pdf_digest(self.contest) == self.digest:
+                self.build()
+        finally:
+            cache.delete(self.lock_key)
+
+    def touch(self):
+        """Marks the PDF as recently used for sweep_pdf_cache()."""
+        try:
+            if os.stat(self.path).st_mtime < time.time() - TOUCH_INTERVAL:
+                os.utime(self.path)
+        except OSError:
+            pass
+
+    def build(self):
+        if DefaultPdfMaker is None:
+            self.build_from_url()
+            return
+
+        with DefaultPdfMaker() as maker:
+            context = get_raw_context(self.contest)
+            context['math_engine'] = context['MATH_ENGINE'] = maker.math_engine
+            context['base_url'] = settings.SITE_FULL_URL + '/'
+            maker.html = get_template('contest/raw.html').render(context)
+            maker.title = self.contest.name
+            maker.make()
+            if not maker.success or not maker.created:
+                logger.error('Failed to render PDF for %s:\n%s', self.contest.key, maker.log)
+                return
+            # Move into place atomically so that a request never serves a partially written file.
+            temp = '%s.%d.tmp' % (self.path, os.getpid())
+            shutil.move(maker.pdffile, temp)
+            os.replace(temp, self.path)
+
+    def build_from_url(self):
+        from django_selenium_pdfmaker.modules import PDFMaker
+
+        # The maker writes <filename>.pdf into the cache directory, so render under a temporary name and move it into
+        # place, as build() does.
+        temp = '%s.%d.tmp' % (self.filename[:-len('.pdf')], os.getpid())
+        PDFMaker().get_pdf_from_html(path=settings.SITE_FULL_URL + '/contest/%s/raw' % self.contest.key,
+                                     filename=temp, write=True)
+        try:
+            os.replace(os.path.join(settings.PDF_PROBLEM_CACHE, temp + '.pdf'), self.path)
+        except FileNotFoundError:
+            logger.error('Failed to render PDF for %s from %s', self.contest.key, settings.SITE_FULL_URL)
@@ -0,0 +1,348 @@
+import json
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Q
+from django.template.loader import render_to_string
+from django.utils.functional import cached_property
+from django.utils.safestring import mark_safe
+from django_redis import get_redis_connection
+
+from backend.utils.versioned_cache import bump_version, get_version
+from education.models.contest import ContestParticipation
+
+__all__ = ['ContestRankingList', 'ContestRankingProfile', 'ScoreboardRow', 'Scoreboard', 'bump_scoreboard_version',
+           'get_scoreboard', 'get_scoreboard_version', 'make_contest_ranking_profile', 'make_scoreboard_row',
+           'refresh_scoreboard_rows']
+
+ContestRankingProfile = namedtuple(
+    'ContestRankingProfile',
+    'id user css_class username points cumtime tiebreaker organization participation '
+    'participation_rating problem_cells result_cell',
+)
+
+ScoreboardRow = namedtuple('ScoreboardRow', 'id username points cumtime tiebreaker is_disqualified breakdown row_html')
+
+# Offsets that keep the encoded sort fields non-negative, so that they can be compared as fixed width strings.
+SCORE_BASE = 1e9
+TIEBREAKER_BASE = 1e9
+
+# Seconds a build may hold the lock of a board before another process may start one.
+BUILD_TIMEOUT = 60
+
+
+def make_contest_ranking_profile(contest, participation, contest_problems):
+    def display_user_problem(contest_problem):
+        try:
+            return contest.format.display_user_problem(participation, contest_problem)
+        except (KeyError, TypeError, ValueError):
+            return mark_safe('<td>???</td>')
+
+    user = participation.user
+
+    return ContestRankingProfile(
+        id=user.id,
+        user=user,
+        css_class=user.css_class,
+        username=user.username,
+        points=participation.score,
+        cumtime=participation.cumtime,
+        tiebreaker=participation.tiebreaker,
+        organization=user.organization,
+        participation_rating=participation.rating.rating if hasattr(participation, 'rating') else None,
+        problem_cells=[display_user_problem(problem) for problem in contest_problems],
+        result_cell=contest.format.display_participation_result(participation),
+        participation=participation
+    )
+
+
+def make_scoreboard_row(contest, participation, contest_problems):
+    profile = make_contest_ranking_profile(contest, participation, contest_problems)
+    return ScoreboardRow(
+        id=participation.id,
+        username=profile.username,
+        points=participation.score,
+        cumtime=int(participation.cumtime),
+        tiebreaker=participation.tiebreaker,
+        is_disqualified=participation.is_disqualified,
+        breakdown=contest.format.get_problem_breakdown(participation, contest_problems),
+        row_html=mark_safe(render_to_string('contest/row-cells.html', {'user': profile})),
+    )
+
+
+def _sort_prefix(row):
+    # Matches the ('is_disqualified', '-score', 'cumtime', 'tiebreaker') ordering of the ranking queryset.
+    return '%d%024.10f%012d%024.10f' % (row.is_disqualified, SCORE_BASE - row.points, row.cumtime,
+                                        TIEBREAKER_BASE + row.tiebreaker)
+
+
+def _sort_member(row):
+    return '%s|%d' % (_sort_prefix(row), row.id)
+
+
+class Scoreboard(object):
+    """
+    The materialized ranking of a contest's live participations, kept in Redis.
+
+    The order is a sorted set whose members all have score 0 and sort lexicographically by their encoded
+    (is_disqualified, -score, cumtime, tiebreaker) prefix, so ties are contiguous. The pre-rendered rows are kept in a
+    hash keyed by participation id. The board is built from the database on first read, and every participation
+    save afterwards only replaces that participation's row. Saves that happen before the board is built are recorded in
+    a set of dirty ids, which the build applies again once it has written the board, so that a save committed while
+    the build was reading the database is never lost.
+    """
+
+    def __init__(self, contest, connection, cache):
+        self.contest = contest
+        self.connection = connection
+        self.order_key = cache.make_key('scoreboard:%d:order' % contest.id)
+        self.rows_key = cache.make_key('scoreboard:%d:rows' % contest.id)
+        self.built_key = cache.make_key('scoreboard:%d:built' % contest.id)
+        self.lock_key = cache.make_key('scoreboard:%d:lock' % contest.id)
+        self.dirty_key = cache.make_key('scoreboard:%d:dirty' % contest.id)
+
+    def get_contest_problems(self):
+        return list(self.contest.contest_problems.select_related('problem').defer('problem__description')
+                    .order_by('order'))
+
+    @property
+    def is_built(self):
+        return bool(self.connection.exists(self.built_key))
+
+    def ensure_built(self):
+        return self.is_built or self.build()
+
+    def build(self):
+        """Builds the board from the database. Returns False if another process is already building it."""
+        if not self.connection.set(self.lock_key, 1, nx=True, ex=BUILD_TIMEOUT):
+            return False
+        try:
+            # Saves marked dirty so far were committed before the read below, so it sees them.
+            self.connection.delete(self.dirty_key)
+            problems = self.get_contest_problems()
+            rows = [make_scoreboard_row(self.contest, participation, problems)
+                    for participation in self.get_participations()]
+
+            pipe = self.connection.pipeline()
+            pipe.delete(self.order_key, self.rows_key)
+            if rows:
+                pipe.zadd(self.order_key, {_sort_member(row): 0 for row in rows})
+                pipe.hset(self.rows_key, mapping={row.id: self._dump(row) for row in rows})
+            pipe.set(self.built_key, 1)
+            for key in (self.order_key, self.rows_key, self.built_key):
+                pipe.expire(key, settings.SCOREBOARD_CACHE_TTL)
+            pipe.execute()
+            self.apply_dirty(problems)
+        finally:
+            self.connection.delete(self.lock_key)
+        return True
+
+    def get_participations(self):
+        return self.contest.users.filter(virtual=ContestParticipation.LIVE).select_related('user__user') \
+                                 .prefetch_related('user__organizations').defer('user__about')
+
+    def apply_dirty(self, problems):
+        """Replaces the rows of the participations saved while the board was being built."""
+        pipe = self.connection.pipeline()
+        pipe.smembers(self.dirty_key)
+        pipe.delete(self.dirty_key)
+        ids = {int(id) for id in pipe.execute()[0]}
+        if not ids:
+            return
+        for participation in self.get_participations().filter(id__in=ids):
+            ids.discard(participation.id)
+            self.replace(make_scoreboard_row(self.contest, participation, problems))
+        # Whatever is left was deleted, or is no longer a live participation.
+        for id in ids:
+            self.remove(id)
+
+    def mark_dirty(self, participation_id):
+        """Records a participation as saved if the board is not built yet. Returns whether the board is built."""
+        def add_dirty(pipe):
+            if pipe.exists(self.built_key):
+                return True
+            pipe.multi()
+            pipe.sadd(self.dirty_key, participation_id)
+            pipe.expire(self.dirty_key, BUILD_TIMEOUT)
+            return False
+
+        # Watching the built flag makes sure the id is added before a build finishes, or not at all.
+        return self.connection.transaction(add_dirty, self.built_key, value_from_callable=True)
+
+    def update(self, participation):
+        if participation.virtual != ContestParticipation.LIVE or not self.mark_dirty(participation.id):
+            return
+        self.replace(make_scoreboard_row(self.contest, participation, self.get_contest_problems()))
+
+    def replace(self, row):
+        def replace_row(pipe):
+            old = pipe.hget(self.rows_key, row.id)
+            pipe.multi()
+            if old is not None:
+                pipe.zrem(self.order_key, json.loads(old)['member'])
+            pipe.zadd(self.order_key, {_sort_member(row): 0})
+            pipe.hset(self.rows_key, row.id, self._dump(row))
+
+        self.connection.transaction(replace_row, self.rows_key)
+
+    def remove(self, participation_id):
+        def remove_row(pipe):
+            old = pipe.hget(self.rows_key, participation_id)
+            pipe.multi()
+            if old is not None:
+                pipe.zrem(self.order_key, json.loads(old)['member'])
+            pipe.hdel(self.rows_key, participation_id)
+
+        self.connection.transaction(remove_row, self.rows_key)
+
+    def invalidate(self):
+        self.connection.delete(self.order_key, self.rows_key, self.built_key, self.dirty_key)
+
+    def rows(self, start=0, stop=-1):
+        """Returns the rows ranked from index ``start`` to ``stop`` inclusive, or None if the board is not built."""
+        if not self.ensure_built():
+            return None
+        members = self.connection.zrange(self.order_key, start, stop)
+        if not members:
+            return []
+        ids = [member.rsplit(b'|', 1)[1] for member in members]
+        return [self._load(data) for data in self.connection.hmget(self.rows_key, ids) if data is not None]
+
+    def count(self):
+        return self.connection.zcard(self.order_key)
+
+    def rank_of(self, row):
+        """Returns the rank of a row, which is one more than the number of rows ranked strictly before it."""
+        return self.connection.zlexcount(self.order_key, '-', '(' + _sort_prefix(row)) + 1
+
+    def index_of(self, participation_id):
+        """Returns the index of a participation in the ranking, or None if it is not on the board."""
+        data = self.connection.hget(self.rows_key, participation_id)
+        if data is None:
+            return None
+        return self.connection.zrank(self.order_key, json.loads(data)['member'])
+
+    def _dump(self, row):
+        return json.dumps({
+            'member': _sort_member(row),
+            'username': row.username,
+            'points': row.points,
+            'cumtime': row.cumtime,
+            'tiebreaker': row.tiebreaker,
+            'is_disqualified': row.is_disqualified,
+            'breakdown': row.breakdown,
+            'row_html': row.row_html,
+        })
+
+    def _load(self, data):
+        data = json.loads(data)
+        return ScoreboardRow(
+            id=int(data['member'].rsplit('|', 1)[1]),
+            username=data.get('username'),
+            points=data['points'],
+            cumtime=data['cumtime'],
+            tiebreaker=data['tiebreaker'],
+            is_disqualified=data['is_disqualified'],
+            breakdown=data.get('breakdown', []),
+            row_html=mark_safe(data['row_html']),
+        )
+
+
+class ContestRankingList(object):
+    """
+    The ranking of a contest's live participations as a lazily sliced sequence, so that it can be paginated. Slices
+    are read from the scoreboard when one is available, and otherwise from the database with one query each.
+    """
+
+    ordering = ('is_disqualified', '-score', 'cumtime', 'tiebreaker', 'id')
+
+    def __init__(self, contest, contest_problems):
+        self.contest = contest
+        self.contest_problems = contest_problems
+        self.scoreboard = get_scoreboard(contest)
+        if self.scoreboard is not None and not self.scoreboard.ensure_built():
+            self.scoreboard = None
+
+    @cached_property
+    def queryset(self):
+        return self.contest.users.filter(virtual=ContestParticipation.LIVE).order_by(*self.ordering)
+
+    def count(self):
+        if self.scoreboard is not None:
+            return self.scoreboard.count()
+        return self.queryset.count()
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice) or index.step is not None:
+            raise TypeError('ContestRankingList only supports slicing without a step')
+        start = index.start or 0
+        if self.scoreboard is not None:
+            if index.stop is not None and index.stop <= start:
+                return []
+            return self.scoreboard.rows(start, -1 if index.stop is None else index.stop - 1) or []
+        participations = self.queryset.select_related('user').prefetch_related('user__organizations') \
+                                      .defer('user__about', 'user__organizations__about')[index]
+        return [make_scoreboard_row(self.contest, participation, self.contest_problems)
+                for participation in participations]
+
+    def _before(self, values):
+        # Matches the rows that sort strictly before the given values of the ordering fields.
+        q = None
+        equal = Q()
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip('-')
+            before = equal & Q(**{'%s__%s' % (name, 'gt' if field.startswith('-') else 'lt'): value})
+            q = before if q is None else q | before
+            equal &= Q(**{name: value})
+        return q
+
+    def rank_of(self, row):
+        """Returns the rank of a row, which is one more than the number of rows ranked strictly before it."""
+        if self.scoreboard is not None:
+            return self.scoreboard.rank_of(row)
+        values = (row.is_disqualified, row.points, row.cumtime, row.tiebreaker)
+        return self.queryset.filter(self._before(values)).count() + 1
+
+    def index_of(self, participation):
+        """Returns the index of a live participation in the ranking, or None if it is not ranked."""
+        if participation is None or participation.virtual != ContestParticipation.LIVE:
+            return None
+        if self.scoreboard is not None:
+            return self.scoreboard.index_of(participation.id)
+        values = (participation.is_disqualified, participation.score, participation.cumtime,
+                  participation.tiebreaker, participation.id)
+        return self.queryset.filter(self._before(values)).count()
+
+
+def get_scoreboard_version(contest_id):
+    """Returns a number that changes whenever the ranking of a contest may have changed."""
+    return get_version('scoreboard:%d' % contest_id)
+
+
+def bump_scoreboard_version(contest_id):
+    bump_version('scoreboard:%d' % contest_id)
+
+
+def get_scoreboard(contest):
+    """Returns the Scoreboard of a contest, or None if no Redis cache is configured for scoreboards."""
+    if not settings.SCOREBOARD_CACHE:
+        return None
+    return Scoreboard(contest, get_redis_connection(settings.SCOREBOARD_CACHE), caches[settings.SCOREBOARD_CACHE])
+
+
+def refresh_scoreboard_rows(participations):
+    """
+    Renders the scoreboard rows of live participations again, for when something the rows show changes outside the
+    participation, such as the name or organizations of its user.
+    """
+    participations = participations.filter(virtual=ContestParticipation.LIVE).select_related('contest', 'user__user') \
+                                   .prefetch_related('user__organizations').defer('user__about')
+    for participation in participations:
+        scoreboard = get_scoreboard(participation.contest)
+        if scoreboard is not None:
+            scoreboard.update(participation)
+        bump_scoreboard_version(participation.contest_id)
@@ -1,36 +1,149 @@
-import os
-import errno
+from functools import partial
 
-from django.conf import settings
 from django.core.cache import cache
 from django.core.cache.utils import make_template_fragment_key
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
 
-from education.models.contest import ContestProblem
+from backend.models import Organization, Profile, User
+from backend.models.choices import EFFECTIVE_MATH_ENGINES
+from backend.utils.versioned_cache import bump_version
+from education.bundle import invalidate_task_bundles
+from education.grading import invalidate_answer_keys
+from education.models.contest import ContestParticipation, ContestProblem
+from education.scoreboard import bump_scoreboard_version, get_scoreboard, refresh_scoreboard_rows
 
-from .models import Problem, Contest
-
-def get_pdf_path(basename):
-    return os.path.join(settings.PDF_PROBLEM_CACHE, basename)
-
-def unlink_if_exists(file):
-    try:
-        os.unlink(file)
-    except OSError as e:
-        if e.errno != errno.ENOENT:
-            raise
+from .models import Answer, Problem, Contest
 
 @receiver(post_save, sender=Contest)
-def contest_update(sender, instance, **kwargs):
-  cache.delete_many([make_template_fragment_key('problem_html', (problem.problem.id, 'jax'))
-                    for problem in ContestProblem.objects.filter(contest=instance)])
-  unlink_if_exists(get_pdf_path('%s.pdf' % (instance.key)))
+def contest_update(sender, instance, update_fields, **kwargs):
+  # Joining a contest only saves the user count, which does not show on the scoreboard.
+  if update_fields is None or set(update_fields) != {'user_count'}:
+    scoreboard = get_scoreboard(instance)
+    if scoreboard is not None:
+      transaction.on_commit(scoreboard.invalidate)
+    transaction.on_commit(partial(bump_scoreboard_version, instance.id))
 
 
 @receiver(post_save, sender=Problem)
 def problem_update(sender, instance, **kwargs):
-  cache.delete_many([make_template_fragment_key('problem_html', (instance.id, 'jax'))])
+  cache.delete_many([make_template_fragment_key('problem_html', (instance.id, engine))
+                     for engine in EFFECTIVE_MATH_ENGINES])
+
+  contest_ids = list(ContestProblem.objects.filter(problem=instance).values_list('contest_id', flat=True))
+  # Invalidating before the commit would let a concurrent reader cache the old rows again.
+  transaction.on_commit(partial(invalidate_answer_keys, problem_ids=[instance.id], contest_ids=contest_ids))
+  transaction.on_commit(partial(invalidate_task_bundles, contest_ids))
+
+
+@receiver(post_save, sender=Answer)
+@receiver(post_delete, sender=Answer)
+def answer_update(sender, instance, **kwargs):
+  if instance.problem_id is None:
+    return
+  contest_ids = list(ContestProblem.objects.filter(problem_id=instance.problem_id).values_list('contest_id', flat=True))
+  transaction.on_commit(partial(invalidate_answer_keys, problem_ids=[instance.problem_id], contest_ids=contest_ids))
+  transaction.on_commit(partial(invalidate_task_bundles, contest_ids))
+
+
+@receiver(post_save, sender=ContestProblem)
+@receiver(post_delete, sender=ContestProblem)
+def contest_problem_update(sender, instance, **kwargs):
+  transaction.on_commit(partial(invalidate_answer_keys, contest_ids=[instance.contest_id]))
+  transaction.on_commit(partial(invalidate_task_bundles, [instance.contest_id]))
+
+  scoreboard = get_scoreboard(instance.contest)
+  if scoreboard is not None:
+    transaction.on_commit(scoreboard.invalidate)
+  transaction.on_commit(partial(bump_scoreboard_version, instance.contest_id))
+
+
+@receiver(post_save, sender=ContestParticipation)
+def participation_update(sender, instance, **kwargs):
+  scoreboard = get_scoreboard(instance.contest)
+  if scoreboard is not None:
+    transaction.on_commit(lambda: scoreboard.update(instance))
+  transaction.on_commit(partial(bump_scoreboard_version, instance.contest_id))
+
+
+@receiver(post_delete, sender=ContestParticipation)
+def participation_delete(sender, instance, **kwargs):
+  scoreboard = get_scoreboard(instance.contest)
+  if scoreboard is not None:
+    transaction.on_commit(lambda: scoreboard.remove(instance.id))
+  transaction.on_commit(partial(bump_scoreboard_version, instance.contest_id))
+
+
+# Scoreboard rows show the username and full name of users; logging in only saves last_login.
+SCOREBOARD_USER_FIELDS = {'username', 'first_name', 'last_name'}
+
+
+def _refresh_rows_on_commit(**filters):
+  transaction.on_commit(lambda: refresh_scoreboard_rows(ContestParticipation.objects.filter(**filters)))
+
+
+@receiver(post_save, sender=User)
+def user_update(sender, instance, created, update_fields, **kwargs):
+  if created or (update_fields is not None and not SCOREBOARD_USER_FIELDS.intersection(update_fields)):
+    return
+  _refresh_rows_on_commit(user__user=instance)
+
+
+@receiver(post_save, sender=Organization)
+def organization_update(sender, instance, created, **kwargs):
+  if not created:
+    _refresh_rows_on_commit(user__organizations=instance)
+
+
+@receiver(m2m_changed, sender=Profile.organizations.through)
+def profile_organizations_changed(sender, instance, action, reverse, pk_set, **kwargs):
+  # Clearing the members of an organization does not pass their ids, so they are read before the rows are gone.
+  if reverse and action == 'pre_clear':
+    instance._cleared_member_ids = list(sender.objects.filter(organization=instance)
+                                        .values_list('profile_id', flat=True))
+  if action not in ('post_add', 'post_remove', 'post_clear'):
+    return
+  if not reverse:
+    _refresh_rows_on_commit(user=instance)
+  elif action == 'post_clear':
+    _refresh_rows_on_commit(user_id__in=getattr(instance, '_cleared_member_ids', []))
+  else:
+    _refresh_rows_on_commit(user_id__in=list(pk_set))
+
+
+def _changed_ids(sender, instance, action, reverse, pk_set, field):
+  # Clearing from the profile side does not pass the ids, so they are read before the rows are gone.
+  if reverse and action == 'pre_clear':
+    instance.__dict__.setdefault('_cleared_ids', {})[sender] = list(
+      sender.objects.filter(profile=instance).values_list(field, flat=True))
+  if action not in ('post_add', 'post_remove', 'post_clear'):
+    return []
+  if not reverse:
+    return [instance.pk]
+  if action == 'post_clear':
+    return instance.__dict__.get('_cleared_ids', {}).pop(sender, [])
+  return list(pk_set or ())
+
+
+def _bump_versions_on_commit(keys):
+  # Bumping before the commit would let a concurrent reader cache the old ids again.
+  def bump():
+    for key in keys:
+      bump_version(key)
+
+  if keys:
+    transaction.on_commit(bump)
+
+
+@receiver(m2m_changed, sender=Contest.authors.through)
+@receiver(m2m_changed, sender=Contest.curators.through)
+def contest_editors_changed(sender, instance, action, reverse, pk_set, **kwargs):
+  _bump_versions_on_commit(['contest_editors:%d' % contest_id
+                            for contest_id in _changed_ids(sender, instance, action, reverse, pk_set, 'contest_id')])
+
 
-  for contest in ContestProblem.objects.filter(problem=instance):
-    unlink_if_exists(get_pdf_path('%s.pdf' % (contest.contest.key)))
+@receiver(m2m_changed, sender=Problem.authors.through)
+def problem_authors_changed(sender, instance, action, reverse, pk_set, **kwargs):
+  _bump_versions_on_commit(['problem_authors:%d' % problem_id
+                            for problem_id in _changed_ids(sender, instance, action, reverse, pk_set, 'problem_id')])
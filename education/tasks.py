@@ -0,0 +1,108 @@
+import logging
+from datetime import timedelta
+
+from celery import Task, shared_task
+from django.conf import settings
+from django.db import DatabaseError
+from django.utils import timezone
+
+from backend import event_poster as event
+from education.models.contest import Contest
+from education.models.submission import Submission
+
+__all__ = ['judge_submission', 'build_contest_pdf', 'warm_contest_pdfs', 'sweep_contest_pdfs', 'export_contest_word']
+
+logger = logging.getLogger('education.tasks')
+
+
+def post_submission_result(submission):
+    event.post('sub_%s' % Submission.get_id_secret(submission.id), {
+        'type': 'grading-end',
+        'points': submission.points,
+        'max_points': submission.max_points,
+        'result': submission.result,
+    })
+    event.post('submissions', {
+        'type': 'done-submission',
+        'id': submission.id,
+        'contest': submission.contest.key if submission.contest_id else None,
+        'user': submission.profile_id or (submission.user.user_id if submission.user_id else None),
+        'result': submission.result,
+    })
+
+
+class JudgeTask(Task):
+    """Marks a submission as an internal error once grading has failed for good, so that it never stays pending."""
+
+    def on_failure(self, exc, task_id, args, kwargs, einfo):
+        submission_id = args[0] if args else kwargs['submission_id']
+        logger.error('Failed to grade submission %s', submission_id, exc_info=einfo.exc_info)
+        try:
+            submission = Submission.objects.select_related('user', 'contest').get(id=submission_id)
+        except Submission.DoesNotExist:
+            return
+        submission.result = 'IE'
+        submission.save(update_fields=['result'])
+        post_submission_result(submission)
+
+
+# Database errors are usually transient, e.g. a deadlock while locking the participation row; anything else is a bug
+# that grading again would not fix.
+@shared_task(base=JudgeTask, autoretry_for=(DatabaseError,), max_retries=settings.JUDGE_MAX_RETRIES,
+             retry_backoff=True)
+def judge_submission(submission_id):
+    try:
+        submission = Submission.objects.select_related('user', 'contest').get(id=submission_id)
+    except Submission.DoesNotExist:
+        return
+
+    submission.judge()
+    if submission.is_contest and submission.user is not None:
+        submission.update_contest()
+
+    post_submission_result(submission)
+
+
+@shared_task
+def build_contest_pdf(contest_id, digest):
+    from education.pdf import ContestPdfJob
+
+    try:
+        contest = Contest.objects.get(id=contest_id)
+    except Contest.DoesNotExist:
+        return
+
+    ContestPdfJob(contest, digest).run()
+
+
+@shared_task
+def warm_contest_pdfs():
+    """Queues the statement PDFs of contests starting soon, so that they are ready before students ask for them."""
+    from education.pdf import ContestPdfJob
+
+    now = timezone.now()
+    contests = Contest.objects.filter(start_time__gt=now,
+                                      start_time__lte=now + timedelta(seconds=settings.PDF_WARM_AHEAD))
+    for contest in contests.only('id', 'key', 'name'):
+        job = ContestPdfJob(contest)
+        if not job.ready:
+            job.schedule()
+
+
+@shared_task
+def sweep_contest_pdfs():
+    from education.pdf import sweep_pdf_cache
+
+    return sweep_pdf_cache()
+
+
+@shared_task
+def export_contest_word(contest_id, digest):
+    from education.word import WordExportJob
+
+    try:
+        contest = Contest.objects.get(id=contest_id)
+    except Contest.DoesNotExist:
+        return
+
+    WordExportJob(contest).run(digest)
@@ -1,3 +1,215 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db import DatabaseError
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from backend.models import User
+from education import grading
+from education.models.contest import Contest, ContestParticipation, ContestProblem
+from education.models.problem import Answer, Problem
+from education.models.submission import Submission, SubmissionProblem
+from education.pdf import get_pdf_digest
+from education.tasks import judge_submission
+from education.views.contest import ContestRankingJson
+from education.views.submission import AllSubmissions
+
+LOCMEM_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'default'},
+    'select2': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'select2'},
+}
+
+
+# Tasks run eagerly under `manage.py test`, see CELERY_TASK_ALWAYS_EAGER in the settings.
+@override_settings(CACHES=LOCMEM_CACHES, SCOREBOARD_CACHE=None)
+@mock.patch('education.tasks.event.post')
+class JudgeSubmissionTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.profile = User.objects.create(username='student').profile
+        now = timezone.now()
+        cls.contest = Contest.objects.create(key='judge', name='Judge', start_time=now - timedelta(hours=1),
+                                             end_time=now + timedelta(hours=1))
+        cls.contest_problems = []
+        for order in range(2):
+            problem = Problem.objects.create(code='judge%d' % order, name='Judge %d' % order, description='1 + 1?')
+            Answer.objects.create(problem=problem, description='2', is_correct=True)
+            Answer.objects.create(problem=problem, description='3')
+            cls.contest_problems.append(ContestProblem.objects.create(problem=problem, contest=cls.contest,
+                                                                      points=1, order=order))
+        cls.participation = ContestParticipation.objects.create(contest=cls.contest, user=cls.profile)
+
+    def setUp(self):
+        grading._local_answer_keys.clear()
+        self.submission = Submission.objects.create(user=self.participation, contest=self.contest, result='PE',
+                                                    time=timezone.now())
+        SubmissionProblem.objects.bulk_create([
+            SubmissionProblem(submission=self.submission, problem=self.contest_problems[0], output='2'),
+            SubmissionProblem(submission=self.submission, problem=self.contest_problems[1], output='3'),
+        ])
+
+    def judge_with(self, side_effect):
+        """Runs judge_submission with Submission.judge calling side_effect first, returning the number of calls."""
+        judge = Submission.judge
+        calls = []
+
+        def patched_judge(submission):
+            calls.append(submission.id)
+            side_effect(len(calls))
+            judge(submission)
+
+        with mock.patch.object(Submission, 'judge', patched_judge):
+            judge_submission.delay(self.submission.id)
+        self.submission.refresh_from_db()
+        return len(calls)
+
+    def test_grades_submission(self, post):
+        judge_submission.delay(self.submission.id)
+
+        self.submission.refresh_from_db()
+        self.assertEqual(self.submission.result, 'WA')
+        self.assertEqual(self.submission.points, 1)
+        self.assertEqual(self.submission.max_points, 2)
+        self.assertEqual(list(self.submission.problems.order_by('problem__order').values_list('result', flat=True)),
+                         [True, False])
+        self.participation.refresh_from_db()
+        self.assertEqual(self.participation.score, 1)
+        self.assertEqual([call.args[1]['type'] for call in post.call_args_list], ['grading-end', 'done-submission'])
+        self.assertEqual(post.call_args_list[-1].args[1]['result'], 'WA')
+
+    def test_retries_database_errors(self, post):
+        def fail_once(call):
+            if call == 1:
+                raise DatabaseError('deadlock')
+
+        self.assertEqual(self.judge_with(fail_once), 2)
+        self.assertEqual(self.submission.result, 'WA')
+
+    def test_marks_internal_error_after_retries(self, post):
+        def fail(call):
+            raise DatabaseError('deadlock')
+
+        self.assertEqual(self.judge_with(fail), settings.JUDGE_MAX_RETRIES + 1)
+        self.assertEqual(self.submission.result, 'IE')
+        self.assertEqual(post.call_args_list[-1].args[1]['result'], 'IE')
+
+    def test_marks_internal_error_without_retrying_bugs(self, post):
+        def fail(call):
+            raise ValueError('bug')
+
+        self.assertEqual(self.judge_with(fail), 1)
+        self.assertEqual(self.submission.result, 'IE')
+
+    def test_ignores_deleted_submission(self, post):
+        submission_id = self.submission.id
+        self.submission.delete()
+
+        judge_submission.delay(submission_id)
+        post.assert_not_called()
+
+
+@override_settings(CACHES=LOCMEM_CACHES, SCOREBOARD_CACHE=None)
+class IngestAnswersTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.contest = Contest.objects.create(key='ingest', name='Ingest', start_time=now - timedelta(hours=1),
+                                             end_time=now + timedelta(hours=1))
+        Problem.objects.bulk_create([Problem(code='ingest%d' % order, name='Ingest %d' % order, description='?')
+                                     for order in range(50)])
+        ContestProblem.objects.bulk_create([
+            ContestProblem(problem=problem, contest=cls.contest, points=1, order=order)
+            for order, problem in enumerate(Problem.objects.filter(code__startswith='ingest').order_by('id'))
+        ])
+        cls.problems = list(ContestProblem.objects.filter(contest=cls.contest).order_by('order'))
+
+    def ingest(self, problems):
+        submission = Submission.objects.create(contest=self.contest, result='PE')
+        answers = {'answer_%d' % problem.id: str(problem.order) for problem in problems}
+        # One query for the existing rows and one to insert the new ones.
+        with self.assertNumQueries(2):
+            result = grading.ingest_answers(SubmissionProblem, submission, problems, answers)
+        self.assertEqual(submission.problems.count(), len(problems))
+        return result
+
+    def test_one_answer(self):
+        self.assertEqual(self.ingest(self.problems[:1]), (1, 2))
+
+    def test_many_answers(self):
+        self.assertEqual(self.ingest(self.problems), (50, 2))
+
+    def test_updates_existing_and_skips_unanswered(self):
+        submission = Submission.objects.create(contest=self.contest, result='PE')
+        answers = {'answer_%d' % self.problems[0].id: 'a', 'answer_%d' % self.problems[1].id: 'b'}
+        grading.ingest_answers(SubmissionProblem, submission, self.problems, answers)
+        answers['answer_%d' % self.problems[0].id] = 'c'
+
+        # One query for the existing rows and one to update the changed answer.
+        self.assertEqual(grading.ingest_answers(SubmissionProblem, submission, self.problems, answers), (1, 2))
+        self.assertEqual(dict(submission.problems.values_list('problem_id', 'output')),
+                         {self.problems[0].id: 'c', self.problems[1].id: 'b'})
+
+
+@override_settings(CACHES=LOCMEM_CACHES, SCOREBOARD_CACHE=None)
+class ContestRankingJsonTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.contest = Contest.objects.create(key='ranking', name='Ranking', start_time=now - timedelta(hours=1),
+                                             end_time=now + timedelta(hours=1))
+        for index, score in enumerate([3, 3, 3, 1]):
+            profile = User.objects.create(username='ranked%d' % index).profile
+            ContestParticipation.objects.create(contest=cls.contest, user=profile, score=score)
+
+    def get_ranks(self, page_number, paginate_by):
+        view = ContestRankingJson()
+        view.request = RequestFactory().get('/', {'page': page_number})
+        view.object = self.contest
+        view.paginate_by = paginate_by
+        rows, num_pages = view.get_page([], True, page_number)
+        return [rank for rank, row in rows], num_pages
+
+    def test_first_page_starts_at_one(self):
+        self.assertEqual(self.get_ranks(1, 100), ([1, 1, 1, 4], 1))
+        self.assertEqual(self.get_ranks(1, 2), ([1, 1], 2))
+
+    def test_page_starting_inside_tie(self):
+        self.assertEqual(self.get_ranks(2, 2), ([1, 4], 2))
+
+
+@override_settings(CACHES=LOCMEM_CACHES, SCOREBOARD_CACHE=None)
+class AllSubmissionsTestCase(TestCase):
+    def test_lists_submitted_sheets_waiting_for_grading(self):
+        now = timezone.now()
+        contest = Contest.objects.create(key='list', name='List', start_time=now - timedelta(hours=1),
+                                         end_time=now + timedelta(hours=1))
+        unsubmitted = Submission.objects.create(contest=contest, result='PE')
+        waiting = Submission.objects.create(contest=contest, result='PE', time=now)
+        graded = Submission.objects.create(contest=contest, result='AC', time=now)
+
+        view = AllSubmissions()
+        view.request = RequestFactory().get('/')
+        view.request.user = AnonymousUser()
+        view.request.in_contest = False
+        ids = set(view.get_queryset().values_list('id', flat=True))
+        self.assertIn(waiting.id, ids)
+        self.assertIn(graded.id, ids)
+        self.assertNotIn(unsubmitted.id, ids)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, SCOREBOARD_CACHE=None)
+class PdfDigestTestCase(TestCase):
+    def test_label_script_changes_digest(self):
+        now = timezone.now()
+        contest = Contest.objects.create(key='digest', name='Digest', start_time=now - timedelta(hours=1),
+                                         end_time=now + timedelta(hours=1))
+        problem = Problem.objects.create(code='digest', name='Digest', description='1 + 1?')
+        ContestProblem.objects.create(problem=problem, contest=contest, points=1, order=0)
+        digest = get_pdf_digest(contest)
+        self.assertEqual(get_pdf_digest(contest), digest)
+
+        contest.problem_label_script = 'function(n) return tostring(n) end'
+        self.assertNotEqual(get_pdf_digest(contest), digest)
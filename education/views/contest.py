@@ -3,13 +3,10 @@ from functools import partial
 from itertools import chain
 from operator import attrgetter
 import random
-import os
-import logging
-import shutil
 from django import forms
 from django.conf import settings
-from django.db import IntegrityError
-from django.http import Http404, HttpResponseRedirect, HttpResponse
+from django.db import IntegrityError, transaction
+from django.http import Http404, HttpResponseRedirect, HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, render
 from django.urls import reverse
 from django.views import View
@@ -18,18 +15,25 @@ from django.views.generic.detail import BaseDetailView, SingleObjectMixin
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
-from django.utils.safestring import mark_safe
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
 from django.utils.functional import cached_property
 from django.db.models import Q, F, Max
 from django.template.loader import get_template
 from backend.utils.ranker import ranker
 
-from backend.utils.views import generic_message, QueryStringSortMixin, TitleMixin, DiggPaginatorMixin, add_file_response
-from backend.pdf import HAS_PDF, DefaultPdfMaker
+from backend.utils.diggpaginator import DiggPaginator, ExPaginator, InvalidPage
+from backend.utils.views import generic_message, QueryStringSortMixin, TitleMixin, DiggPaginatorMixin, add_file_response, \
+  paginate_query_context
 from education.models import Contest
 from education.models.contest import ContestParticipation, ContestProblem, ContestSolution
 from education.models.problem import Answer
 from education.models.submission import Submission, SubmissionProblem
+from education.bundle import get_task_bundle, shuffle_tasks, task_seed
+from education.grading import ingest_answers
+from education.pdf import ContestPdfJob, get_raw_context
+from education.scoreboard import ContestRankingList, get_scoreboard, get_scoreboard_version, make_scoreboard_row
+from education.tasks import judge_submission
 
 class PrivateContestError(Exception):
     def __init__(self, name, is_private, is_organization_private, orgs):
@@ -68,9 +72,7 @@ class ContestMixin(object):
 
   @cached_property
   def is_editor(self):
-    if not self.request.user.is_authenticated:
-      return False
-    return self.request.profile.id in self.object.editor_ids
+    return self.object.get_access(self.request.user).is_editor
 
   @cached_property
   def can_edit(self):
@@ -283,7 +285,6 @@ class ContestJoin(LoginRequiredMixin, ContestMixin, BaseDetailView):
     
     user.current_contest = participation
     user.save()
-    contest._updating_stats_only = True
     contest.update_user_count()
     return HttpResponseRedirect(reverse('education:contest_detail', kwargs={'contest': contest.key}))
   
@@ -316,45 +317,20 @@ class ContestLeave(LoginRequiredMixin, ContestMixin, BaseDetailView):
     return HttpResponseRedirect(reverse('education:contest_detail', kwargs={'contest': contest.key}))
 
 
-ContestRankingProfile = namedtuple(
-  'ContestRankingProfile',
-  'id user css_class username points cumtime tiebreaker organization participation '
-  'participation_rating problem_cells result_cell',
-)
-
 BestSolutionData = namedtuple(
   'BestSolutionData', 'code points time state is_pretested'
 )
 
-def make_contest_ranking_profile(contest, participation, contest_problems):
-  def display_user_problem(contest_problem):
-    try:
-      return contest.format.display_user_problem(participation, contest_problem)
-    except (KeyError, TypeError, ValueError):
-      return mark_safe('<td>???</td>')
-
-  user = participation.user
-
-  return ContestRankingProfile(
-    id=user.id,
-    user=user,
-    css_class=user.css_class,
-    username=user.username,
-    points=participation.score,
-    cumtime=participation.cumtime,
-    tiebreaker=participation.tiebreaker,
-    organization=user.organization,
-    participation_rating=participation.rating.rating if hasattr(participation, 'rating') else None,
-    problem_cells=[display_user_problem(problem) for problem in contest_problems],
-    result_cell=contest.format.display_participation_result(participation),
-    participation=participation
-  )
-
 def base_contest_ranking_list(contest, problems, queryset):
-  return [make_contest_ranking_profile(contest, participation, problems) for participation in 
+  return [make_scoreboard_row(contest, participation, problems) for participation in 
           queryset.select_related('user').defer('user__about', 'user__organizations__about')]
 
 def contest_ranking_list(contest, problems):
+  scoreboard = get_scoreboard(contest)
+  if scoreboard is not None:
+    rows = scoreboard.rows()
+    if rows is not None:
+      return rows
   return base_contest_ranking_list(contest, problems, contest.users.filter(virtual=0)
                                   .prefetch_related('user__organizations')
                                   .order_by('is_disqualified', '-score', 'cumtime', 'tiebreaker'))
@@ -397,34 +373,145 @@ def get_contest_ranking_list(request, contest, participation=None, ranking_list=
             if participation is None or participation.contest_id != contest.id:
                 participation = None
         if participation is not None and participation.virtual:
-            users = chain([('-', make_contest_ranking_profile(contest, participation, problems))], users)
+            users = chain([('-', make_scoreboard_row(contest, participation, problems))], users)
     
     return users, problems
 
 
 class ContestRanking(ContestRankingBase):
   tab = 'ranking'
+  paginate_by = 100
+  page = None
 
   def get_title(self):
     return _('%s Rankings') % self.object.name
 
   def get_ranking_list(self):
     if not self.object.can_see_full_scoreboard(self.request.user):
-      queryset = self.object.users.filter(user=self.request.user, virtual=ContestParticipation.LIVE)
+      queryset = self.object.users.filter(user=self.request.profile, virtual=ContestParticipation.LIVE)
       return get_contest_ranking_list(
         self.request, self.object,
         ranking_list=partial(base_contest_ranking_list, queryset=queryset),
         ranker=lambda users, key: ((_('???'), user) for user in users),
       )
 
-    return get_contest_ranking_list(self.request, self.object)
+    return get_contest_ranking_list(self.request, self.object, ranking_list=self.get_ranking_page,
+                                    ranker=self.rank_page)
+
+  def get_page_number(self, ranking):
+    number = self.request.GET.get('page', 1)
+    if number != 'me':
+      return number
+    participation = None
+    if self.request.user.is_authenticated:
+      participation = self.object.users.filter(user=self.request.profile, virtual=ContestParticipation.LIVE).first()
+    index = ranking.index_of(participation)
+    return 1 if index is None else index // self.paginate_by + 1
+
+  def get_ranking_page(self, contest, problems):
+    self.ranking = ContestRankingList(contest, problems)
+    paginator = DiggPaginator(self.ranking, self.paginate_by, body=6, padding=2)
+    try:
+      self.page = paginator.page(self.get_page_number(self.ranking), softlimit=True)
+    except InvalidPage:
+      raise Http404()
+    return self.page.object_list
+
+  def rank_page(self, users, key):
+    if not users:
+      return iter(())
+    return ranker(users, key=key, rank=self.ranking.rank_of(users[0]), offset=self.page.start_index() - 1)
 
   def get_context_data(self, **kwargs):
     context = super().get_context_data(**kwargs)
     # context['has_rating'] = self.object.ratings.exists()
+    if self.page is not None:
+      context['page_obj'] = self.page
+      context['paginator'] = self.page.paginator
+      context.update(paginate_query_context(self.request))
     return context
 
 
+class ContestRankingJson(ContestMixin, BaseDetailView):
+  """
+  The contest ranking as compact JSON, built from the machine-readable problem breakdown of the contest format.
+  The full ranking is served paginate_by rows at a time, selected with ?page=. Responses carry an ETag of the
+  contest's scoreboard version, so polling clients get a 304 until it changes.
+  """
+  paginate_by = 100
+
+  def get_etag(self, full, page_number):
+    user = self.request.user
+    return quote_etag('%d-%d-%s' % (self.object.id, get_scoreboard_version(self.object.id),
+                                    'full%s' % page_number if full else
+                                    'own%d' % (user.id if user.is_authenticated else 0)))
+
+  def get_page_number(self):
+    try:
+      return int(self.request.GET.get('page', 1))
+    except ValueError:
+      return None
+
+  def get_page(self, problems, full, page_number):
+    """Returns the ranked rows of a page and the number of pages."""
+    if not full:
+      queryset = self.object.users.filter(user=self.request.profile, virtual=ContestParticipation.LIVE)
+      return [(None, row) for row in base_contest_ranking_list(self.object, problems, queryset)], 1
+
+    ranking = ContestRankingList(self.object, problems)
+    page = ExPaginator(ranking, self.paginate_by).page(page_number)
+    users = list(page.object_list)
+    if not users:
+      return [], page.paginator.num_pages
+    return ranker(users, key=attrgetter('points', 'cumtime', 'tiebreaker'), rank=ranking.rank_of(users[0]),
+                  offset=page.start_index() - 1), page.paginator.num_pages
+
+  def get(self, request, *args, **kwargs):
+    try:
+      self.object = self.get_object()
+    except Http404:
+      return JsonResponse({'error': 'not_found'}, status=404)
+    if not self.object.can_see_own_scoreboard(request.user):
+      return JsonResponse({'error': 'forbidden'}, status=403)
+
+    full = self.object.can_see_full_scoreboard(request.user)
+    page_number = self.get_page_number()
+    if page_number is None:
+      return JsonResponse({'error': 'invalid_page'}, status=404)
+    etag = self.get_etag(full, page_number)
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+      return response
+
+    problems = list(self.object.contest_problems.select_related('problem').defer('problem__description')
+                    .order_by('order'))
+    try:
+      rows, num_pages = self.get_page(problems, full, page_number)
+    except InvalidPage:
+      return JsonResponse({'error': 'invalid_page'}, status=404)
+    response = JsonResponse({
+      'page': page_number if full else 1,
+      'num_pages': num_pages,
+      'problems': [{
+        'id': problem.id,
+        'label': self.object.format.get_label_for_problem(index),
+        'points': problem.points,
+      } for index, problem in enumerate(problems)],
+      'rankings': [{
+        'rank': rank,
+        'user': row.username,
+        'points': row.points,
+        'cumtime': row.cumtime,
+        'tiebreaker': row.tiebreaker,
+        'is_disqualified': row.is_disqualified,
+        'breakdown': row.breakdown,
+      } for rank, row in rows],
+    })
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
 def get_answer_contest_problem(problem):
   ans = list(Answer.objects.filter(problem=problem))
   random.shuffle(ans)
@@ -434,7 +521,7 @@ def get_answer_contest_problem(problem):
 def get_participation(user, contest):
   LIVE = ContestParticipation.LIVE
   SPECTATE = ContestParticipation.SPECTATE
-  spectate = user.id in contest.editor_ids
+  spectate = user.profile.id in contest.editor_ids
   if not contest.ended:
     participation = ContestParticipation.objects.get_or_create(
       user=user,
@@ -460,22 +547,14 @@ class ContestTaskView(LoginRequiredMixin, ContestMixin, TitleMixin, DetailView):
 
   def get_context_data(self, **kwargs):
       context = super().get_context_data(**kwargs)
-      problems = list(ContestProblem.objects.filter(contest=self.object).order_by('order'))
-      random.shuffle(problems)
       user = self.request.user
       contest = self.object
-      auth = user.is_authenticated and user.current_contest is not None and user.current_contest.contest == contest
-      auth = auth or self.is_editor
-      context['problems'] = []
-      for problem in problems:
-        answer = get_answer_contest_problem(problem.problem)
-        context['problems'].append((problem, answer))
       participation = get_participation(user, contest)
-      if Submission.objects.filter(user=participation, contest=contest).order_by('-date').exists():
-        last_submission = Submission.objects.filter(user=participation, contest=contest).order_by('-date').first()
-      else:
-        last_submission = None
-      if last_submission is None or last_submission.result != 'PE':
+      context['problems'] = shuffle_tasks(get_task_bundle(contest.id),
+                                          task_seed(contest.id, getattr(participation, 'id', None)))
+      last_submission = Submission.objects.filter(user=participation, contest=contest).order_by('-date').first()
+      # A pending submission that already has a completion time is waiting to be graded.
+      if last_submission is None or last_submission.result != 'PE' or last_submission.time is not None:
         submission = Submission.objects.create(
           user=participation,
           contest=contest,
@@ -501,50 +580,41 @@ class ContestTaskView(LoginRequiredMixin, ContestMixin, TitleMixin, DetailView):
       return generic_message(request, _('Duplicate submission'),
                             _('You must click "Take a test" button to start contest'))
 
-    problems = ContestProblem.objects.filter(contest=contest).select_related('problem').defer('problem__description')
-    for problem in problems:
-      ans = request.POST.get('answer_' + str(problem.id), None)
-      if ans is not None:
-        submissionProblem = SubmissionProblem.objects.get_or_create(
-          submission=submission,
-          problem=problem,
-        )[0]
-        submissionProblem.output = ans
-        submissionProblem.save()
+    ingest_answers(SubmissionProblem, submission, ContestProblem.objects.filter(contest=contest).only('id'),
+                   request.POST)
     submission.time = timezone.now()
-    # print(submission.id)
-    submission.save()
-    submission.judge()
-    submission.update_contest()
+    submission.save(update_fields=['time'])
+    transaction.on_commit(partial(judge_submission.delay, submission.id))
 
     return HttpResponseRedirect(reverse('education:all_submissions'))
   
 
 class ContestTaskPdfView(ContestMixin, SingleObjectMixin, View):
-  logger = logging.getLogger('education.problem.pdf')
-
   def get(self, request, *args, **kwargs):
-    # if not HAS_PDF:
-    #   raise Http404()
-    
     contest = self.get_object()
 
-    cache = os.path.join(settings.PDF_PROBLEM_CACHE, '%s.pdf' % (contest.key))
-
-    if not os.path.exists(cache):
-      from django_selenium_pdfmaker.modules import PDFMaker
-      pdfmaker = PDFMaker()
-      result = pdfmaker.get_pdf_from_html(path=settings.SITE_FULL_URL + '/contest/%s/raw' % (contest.key),
-                                          filename=contest.key, write=True)
-    
+    job = ContestPdfJob(contest)
+    if not job.ready:
+      # Only the first request starts a build; everyone else waits for it instead of starting another browser.
+      job.schedule()
+      if not job.ready:
+        response = generic_message(request, _('Generating PDF'),
+                                   _('The PDF for %s is being generated, this page will reload when it is ready.') %
+                                   contest.name, status=202)
+        response['Retry-After'] = str(settings.PDF_RETRY_AFTER)
+        response['Refresh'] = str(settings.PDF_RETRY_AFTER)
+        patch_cache_control(response, no_cache=True, no_store=True)
+        return response
+
+    job.touch()
     response = HttpResponse()
 
     if hasattr(settings, 'PDF_PROBLEM_INTERNAL'):
-      url_path = '%s/%s.%s.pdf' % (settings.PDF_PROBLEM_INTERNAL, contest.key)
+      url_path = '%s/%s' % (settings.PDF_PROBLEM_INTERNAL, job.filename)
     else:
       url_path = None
     
-    add_file_response(request, response, url_path, cache)
+    add_file_response(request, response, url_path, job.path)
 
     response['Content-Type'] = 'application/pdf'
     response['Content-Disposition'] = 'inline; filename=%s.pdf' % (contest.key)
@@ -556,15 +626,7 @@ class ContestRawView(ContestMixin, DetailView):
 
   def get_context_data(self, **kwargs):
     context = super().get_context_data(**kwargs)
-    contestProblem = list(ContestProblem.objects.filter(contest=self.object).order_by('order'))
-    random.shuffle(contestProblem)
-    problems = []
-    for problem in contestProblem:
-      answer = get_answer_contest_problem(problem.problem)
-      problems.append((problem, answer))
-    context['problems'] = problems
-    context['math_engine'] = 'jax'
-    context['version'] = random.randint(1, 1000000000)
+    context.update(get_raw_context(self.object))
     return context
 
 
@@ -9,6 +9,7 @@ from django.utils.functional import cached_property
 from django.template.loader import render_to_string
 from django.utils import timezone
 
+from backend.utils.counting import default_count_strategy
 from backend.utils.diggpaginator import DiggPaginator
 from backend.templatetags.markdown import markdown
 from education.models import Problem, ProblemGroup
@@ -117,8 +118,10 @@ class ProblemLevelList(QueryStringSortMixin, TitleMixin, ListView):
         return self.get_object().name
 
     def get_paginator(self, queryset, per_page, orphans=0, allow_empty_first_page=True, **kwargs):
-        paginator = DiggPaginator(queryset, per_page, body=6, padding=2, orphans=orphans, 
-                                  allow_empty_first_page=allow_empty_first_page, **kwargs)
+        paginator = DiggPaginator(queryset, per_page, body=6, padding=2, orphans=orphans,
+                                  allow_empty_first_page=allow_empty_first_page,
+                                  count_strategy=default_count_strategy, softlimit=True, **kwargs)
+        # Count the queryset before the sort joins are added to it.
         paginator.num_pages
         sort_key = self.order.lstrip('-')
         if sort_key in self.sql_sort:
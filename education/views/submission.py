@@ -15,7 +15,7 @@ from django.views.generic import ListView, DetailView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from backend.models.profile import Profile
 
-from backend.utils.infinite_paginator import InfinitePaginationMixin
+from backend.utils.infinite_paginator import CursorPaginationMixin
 from backend.utils.problems import _get_result_data
 from backend.utils.raw_sql import join_sql_subquery, use_straight_join
 from backend.utils.views import DiggPaginatorMixin, TitleMixin
@@ -78,11 +78,11 @@ class SubmissionsListBase(DiggPaginatorMixin, TitleMixin, ListView):
 
     @cached_property
     def in_contest(self):
-        return self.request.user.is_authenticated and self.request.user.profile.current_contest is not None
+        return self.request.in_contest
     
     @cached_property
     def contest(self):
-        return self.request.profile.current_contest.contest
+        return self.request.participation.contest
 
     def _get_queryset(self):
         queryset = Submission.objects.all()
@@ -125,7 +125,7 @@ class SubmissionsListBase(DiggPaginatorMixin, TitleMixin, ListView):
         return context
 
     
-class AllSubmissions(InfinitePaginationMixin, SubmissionsListBase):
+class AllSubmissions(CursorPaginationMixin, SubmissionsListBase):
     stats_update_interval = 3600
 
     @property
@@ -133,7 +133,8 @@ class AllSubmissions(InfinitePaginationMixin, SubmissionsListBase):
         return True
 
     def get_queryset(self):
-        return super().get_queryset().exclude(result='PE')
+        # Sheets that were never handed in; submitted ones stay pending until the grader has run.
+        return super().get_queryset().exclude(result='PE', time__isnull=True)
 
     def get_context_data(self, **kwargs):
         context = super(AllSubmissions, self).get_context_data(**kwargs)
@@ -165,7 +166,7 @@ class ContestSubmissionsBase(SubmissionsListBase):
 
     def access_check(self, request):
         # FIXME: This should be rolled into the `is_accessible_by` check when implementing #1509
-        if self.in_contest and request.user.is_authenticated and request.user.id in self.contest.editor_ids:
+        if self.in_contest and self.contest.get_access(request.user).is_editor:
             return
 
         if not self.contest.is_accessible_by(request.user):
@@ -223,7 +224,7 @@ class ConditionalUserTabMixin(object):
         return context
     
 
-class AllUserSubmissions(ConditionalUserTabMixin, UserMixin, SubmissionsListBase):
+class AllUserSubmissions(ConditionalUserTabMixin, UserMixin, CursorPaginationMixin, SubmissionsListBase):
     def get_queryset(self):
         return super(AllUserSubmissions, self).get_queryset().filter(user_id=self.profile.id)
 
@@ -0,0 +1,147 @@
+import glob
+import hashlib
+import os
+import random
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch
+
+from education.models.contest import ContestProblem
+from education.models.problem import Answer
+
+__all__ = ['WordExportJob', 'contest_markdown', 'write_docx', 'prefetch_word_problems']
+
+# Bump when contest_markdown() changes its output, so that every contest gets a new document.
+WORD_VERSION = 1
+
+TABLE_RULE = '+----------------------------------+-----------------------------------+\r\n'
+
+
+def prefetch_word_problems(contests):
+    """Loads the problems and answers of many contests with two queries, returning a dict of contest id to list."""
+    problems = {}
+    queryset = (ContestProblem.objects.filter(contest__in=contests).select_related('problem').order_by('order', 'id')
+                .prefetch_related(Prefetch('problem__answers', queryset=Answer.objects.order_by('id'))))
+    for contest_problem in queryset:
+        problems.setdefault(contest_problem.contest_id, []).append(contest_problem.problem)
+    return problems
+
+
+def get_word_digest(contest, problems):
+    hash = hashlib.sha1()
+    hash.update(('%d\0%s\0%s\0' % (WORD_VERSION, contest.name, settings.SITE_FULL_URL)).encode('utf-8'))
+    for problem in problems:
+        hash.update(('%d\0%s\0%s\0' % (problem.id, problem.answer_type, problem.description)).encode('utf-8'))
+        for answer in problem.answers.all():
+            hash.update(('%s\0' % answer.description).encode('utf-8'))
+    return hash.hexdigest()[:16]
+
+
+def contest_markdown(contest, problems):
+    """Returns the pandoc markdown of a contest, given its problems with prefetched answers."""
+    parts = ['# %s\r\n\r\n' % contest.name]
+    for index, problem in enumerate(problems):
+        parts.append('**Problem %s**: %s\r\n\r\n' % (index + 1, problem.description))
+        if problem.answer_type == 'mc':
+            answers = list(problem.answers.all())
+            random.shuffle(answers)
+            answers = [(chr(idx + 65), answer.description) for idx, answer in enumerate(answers)]
+            if max((len(item) for _, item in answers), default=0) > 30:
+                parts.extend('\t%s. %s\r\n' % answer for answer in answers)
+            else:
+                parts.append(TABLE_RULE)
+                for i, answer in enumerate(answers, 1):
+                    parts.append('\x7c' + (' **%s**. %s' % answer).ljust(34))
+                    if i % 2 == 0:
+                        parts.append('\x7c\r\n' + TABLE_RULE)
+                if len(answers) % 2 == 1:
+                    parts.append('\x7c\r\n' + TABLE_RULE)
+        parts.append('\r\n')
+
+    md = ''.join(parts).replace('~', '$')
+    return md.replace('](/', '](%s/' % settings.SITE_FULL_URL)
+
+
+def write_docx(md, path):
+    """Converts markdown to a .docx file with pandoc. Touches no database, so it can run in a process pool."""
+    import pandoc
+
+    temp = '%s.%d.tmp' % (path, os.getpid())
+    doc = pandoc.read(source=md, format='markdown')
+    pandoc.write(doc=doc, format='docx', file=temp)
+    os.replace(temp, path)
+    return path
+
+
+class WordExportJob(object):
+    """
+    Exports a contest to Word in the background. Documents are named by a hash of the contest's content, so an
+    unchanged contest is served from settings.WORD_CONTEST_CACHE straight away, and a lock in the shared cache makes
+    sure a contest is converted by at most one worker at a time.
+    """
+
+    def __init__(self, contest, problems=None):
+        self.contest = contest
+        if problems is None:
+            problems = prefetch_word_problems([contest]).get(contest.id, [])
+        self.problems = problems
+        self.digest = get_word_digest(contest, problems)
+
+    @property
+    def filename(self):
+        return 'contest_%s.%s.docx' % (self.contest.key, self.digest)
+
+    @property
+    def path(self):
+        return os.path.join(settings.WORD_CONTEST_CACHE, self.filename)
+
+    def make_lock_key(self, digest):
+        return 'contest_word:%d:%s:lock' % (self.contest.id, digest)
+
+    @property
+    def lock_key(self):
+        return self.make_lock_key(self.digest)
+
+    @property
+    def ready(self):
+        return os.path.exists(self.path)
+
+    def schedule(self):
+        """Queues an export unless one is already running. Returns whether an export was queued."""
+        from education.tasks import export_contest_word
+
+        if not cache.add(self.lock_key, True, settings.WORD_JOB_TIMEOUT):
+            return False
+        try:
+            export_contest_word.delay(self.contest.id, self.digest)
+        except Exception:
+            cache.delete(self.lock_key)
+            raise
+        return True
+
+    def run(self, digest=None):
+        """Exports the document while holding the lock taken by schedule() for digest, releasing it when done."""
+        digest = digest or self.digest
+        try:
+            # If the contest was edited since the export was queued, the next request will ask for the new version.
+            if not self.ready and digest == self.digest:
+                self.build()
+        finally:
+            cache.delete(self.make_lock_key(digest))
+
+    def build(self):
+        write_docx(self.markdown(), self.path)
+        self.remove_old_versions()
+
+    def markdown(self):
+        return contest_markdown(self.contest, self.problems)
+
+    def remove_old_versions(self):
+        pattern = os.path.join(settings.WORD_CONTEST_CACHE, 'contest_%s.*.docx' % glob.escape(self.contest.key))
+        for path in glob.glob(pattern):
+            if path != self.path:
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
@@ -1,10 +1,14 @@
+from operator import attrgetter
+
 from django.db import models
+from django.db.models import Sum
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 from django.utils.html import format_html
 from django.utils.functional import cached_property
 
-from education.models.problem import Answer
+from education.grading import grade_submission_problems
+from practice.models.practice import PracticeProblem
 
 SUBMISSION_RESULT = (
     ('AC', _('Accepted')),
@@ -73,13 +77,10 @@ class Submission(models.Model):
         return reverse("submission_status", kwargs={"pk": self.pk})
 
     def judge(self):
-        self.points = 0.0
-        self.max_points = 0.0
-        for problem in self.contest.problems.all():
-            self.max_points += problem.points
-        for problem in self.problems.all():
-            problem.calculator()
-            self.points += problem.points
+        self.max_points = PracticeProblem.objects.filter(contest_id=self.contest_id).aggregate(total=Sum('points'))['total'] or 0
+        self.points = grade_submission_problems(list(self.problems.select_related('problem')),
+                                                problem_id=attrgetter('problem.problem_id'),
+                                                points=attrgetter('problem.points'))
         self.result = 'AC' if self.points == self.max_points else 'WA'
         self.save(update_fields=['points', 'max_points', 'result'])
     judge.alters_data = True
@@ -102,32 +103,6 @@ class SubmissionProblem(models.Model):
     points = models.FloatField(_("points granted"), null=True)
     output = models.TextField(_("student's answer"), blank=True)
 
-    def calculator(self):
-        if self.problem.problem.answer_type == 'mc':
-            answer = Answer.objects.get(problem=self.problem.problem, is_correct=True)
-        if self.problem.problem.answer_type == 'fill':
-            answer = Answer.objects.filter(problem=self.problem.problem).first()
-        self.result = answer.description == self.output
-        if self.result:
-            self.points = self.problem.points
-        else:
-            self.points = 0
-        self.save(update_fields=['result', 'points'])
-    calculator.alters_data = True
-    
-    def calculatorTask(self):
-        if self.task.answer_type == 'mc':
-            answer = Answer.objects.get(problem=self.task, is_correct=True)
-        if self.task.answer_type == 'fill':
-            answer = Answer.objects.filter(problem=self.task).first()
-        self.result = answer.description == self.output
-        if self.result:
-            self.points = 100
-        else:
-            self.points = 0
-        self.save(update_fields=['result', 'points'])
-    calculatorTask.alters_data = True
-
     @cached_property
     def get_long_status(self):
         if self.result:
@@ -9,10 +9,11 @@ from django.views.generic import FormView, DetailView, ListView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
-from backend.utils.infinite_paginator import InfinitePaginationMixin
+from backend.utils.infinite_paginator import CursorPaginationMixin
 from backend.utils.problems import _get_result_data
 from backend.utils.raw_sql import join_sql_subquery, use_straight_join
 
+from education.grading import ingest_answers
 from education.models.problem import Level, Problem
 from education.views.contest import get_answer_contest_problem
 from practice.models.practice import PracticeProblem
@@ -110,16 +111,8 @@ class PracticeTaskView(LoginRequiredMixin, TitleMixin, DetailView):
       return generic_message(request, _('Duplicate submission'),
                             _('You must click "Practice" button to start practice'))
 
-    problems = PracticeProblem.objects.filter(contest=practice).select_related('problem').defer('problem__description')
-    for problem in problems:
-      ans = request.POST.get('answer_' + str(problem.id), None)
-      if ans is not None:
-        submissionProblem = SubmissionProblem.objects.get_or_create(
-          submission=submission,
-          problem=problem,
-        )[0]
-        submissionProblem.output = ans
-        submissionProblem.save()
+    ingest_answers(SubmissionProblem, submission, PracticeProblem.objects.filter(contest=practice).only('id'),
+                   request.POST)
     submission.time = timezone.now()
     # print(submission.id)
     submission.save()
@@ -177,7 +170,7 @@ class SubmissionsListBase(DiggPaginatorMixin, TitleMixin, ListView):
         return context
 
     
-class AllSubmissions(InfinitePaginationMixin, SubmissionsListBase):
+class AllSubmissions(CursorPaginationMixin, SubmissionsListBase):
     stats_update_interval = 3600
 
     @property
@@ -185,7 +178,8 @@ class AllSubmissions(InfinitePaginationMixin, SubmissionsListBase):
         return True
 
     def get_queryset(self):
-        return super().get_queryset().exclude(result='PE')
+        # Sheets that were never handed in.
+        return super().get_queryset().exclude(result='PE', time__isnull=True)
 
     def get_context_data(self, **kwargs):
         context = super(AllSubmissions, self).get_context_data(**kwargs)
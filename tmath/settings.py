@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/4.0/ref/settings/
 
 from pathlib import Path
 import os
+import sys
 import tempfile
 from django.utils.translation import gettext_lazy as _
 
@@ -38,6 +39,22 @@ SITE_LONG_NAME = 'Emath'
 SITE_ADMIN_EMAIL = False
 PDF_PROBLEM_CACHE = ''
 PDF_PROBLEM_TEMP_DIR = tempfile.gettempdir()
+# Seconds before a stuck PDF build releases its lock
+PDF_JOB_TIMEOUT = 300
+# Contests starting within this many seconds get their PDF built ahead of time
+PDF_WARM_AHEAD = 3600
+# Seconds the "generating" page waits before checking again
+PDF_RETRY_AFTER = 5
+# The PDF cache sweep removes PDFs not served for this many seconds, then the least recently served ones until the
+# cache fits in this many bytes
+PDF_CACHE_MAX_AGE = 30 * 86400
+PDF_CACHE_MAX_SIZE = 1024 ** 3
+
+WORD_CONTEST_CACHE = ''
+# Seconds before a stuck Word export releases its lock
+WORD_JOB_TIMEOUT = 300
+# Seconds the "exporting" page waits before checking again
+WORD_RETRY_AFTER = 5
 
 
 NODEJS = '/usr/bin/node'
@@ -53,6 +70,9 @@ MATHOID_DEFAULT_TYPE = 'auto'
 MATHOID_MML_CACHE_TTL = 86400
 MATHOID_CACHE_ROOT = ''
 MATHOID_CACHE_URL = False
+# Dotted path of the MathBackend that pre-renders TeX to MathML for the 'mml' engine, or None to leave math to
+# MathJax. Rendered formulas are cached in MATHOID_MML_CACHE and, if set, on disk under MATHOID_CACHE_ROOT.
+MATHOID_BACKEND = 'backend.utils.mathoid.LocalMathBackend'
 
 TEXOID_GZIP = False
 TEXOID_META_CACHE = 'default'
@@ -112,8 +132,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'backend.middleware.EmathLoginMiddleware',
-    'backend.middleware.ContestMiddleware',
+    'backend.middleware.ProfileMiddleware',
     'backend.middleware.TimezoneMiddleware',
 ]
 
@@ -200,6 +219,31 @@ CACHES = {
 
 SELECT2_CACHE_BACKEND = "select2"
 
+# Answer keys used for grading, cached in the default cache and a short-lived in-process LRU
+ANSWER_KEY_CACHE_TTL = 86400
+ANSWER_KEY_LOCAL_CACHE_SIZE = 512
+ANSWER_KEY_LOCAL_CACHE_TTL = 10
+
+# Paginated lists count up to this many rows exactly; larger counts are estimated by the database where it can, and
+# cached for this many seconds
+PAGINATOR_EXACT_COUNT_LIMIT = 10000
+PAGINATOR_COUNT_CACHE_TTL = 300
+
+# Problems and answers shown on contest task pages, cached like the answer keys
+TASK_BUNDLE_CACHE_TTL = 86400
+TASK_BUNDLE_LOCAL_CACHE_SIZE = 256
+TASK_BUNDLE_LOCAL_CACHE_TTL = 10
+
+# Cache alias of the Redis cache that holds materialized contest scoreboards, or None to rank from the database.
+SCOREBOARD_CACHE = 'default'
+SCOREBOARD_CACHE_TTL = 86400
+
+# Author and curator id sets of contests and problems, invalidated through m2m_changed
+EDITOR_IDS_CACHE_TTL = 86400
+
+# Number of request paths whose navigation tab is memoized per process
+NAV_TAB_CACHE_SIZE = 1024
+
 
 # Event Server configuration
 EVENT_DAEMON_USE = True
@@ -210,6 +254,28 @@ EVENT_DAEMON_KEY = None
 EVENT_DAEMON_AMQP_EXCHANGE = 'dmoj-events'
 EVENT_DAEMON_SUBMISSION_KEY = '6Sdmkx^%pk@GsifDfXcwX*Y7LRF%RGT8vmFpSxFBT$fwS7trc8raWfN#CSfQuKApx&$B#Gh2L7p%W!Ww'
 
+# Celery configuration, used for grading submissions in the background
+CELERY_BROKER_URL = 'redis://127.0.0.1:6379/3'
+CELERY_TASK_IGNORE_RESULT = True
+# Times a submission is regraded after a database error before it is marked as an internal error
+JUDGE_MAX_RETRIES = 3
+# Periodic tasks, run by celery beat
+CELERY_BEAT_SCHEDULE = {
+    'warm-contest-pdfs': {
+        'task': 'education.tasks.warm_contest_pdfs',
+        'schedule': 300.0,
+    },
+    'sweep-contest-pdfs': {
+        'task': 'education.tasks.sweep_contest_pdfs',
+        'schedule': 3600.0,
+    },
+}
+
+if 'test' in sys.argv:
+    # Tests run tasks eagerly, in-process.
+    CELERY_BROKER_URL = 'memory://'
+    CELERY_TASK_ALWAYS_EAGER = True
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/4.0/topics/i18n/
@@ -304,6 +370,11 @@ MARKDOWN_STYLES = {
     'description-full': MARKDOWN_ADMIN_EDITABLE_STYLE,
 }
 
+# Rendered markdown is cached by source hash in a local LRU and in this cache alias; None disables caching
+MARKDOWN_RENDER_CACHE = 'default'
+MARKDOWN_RENDER_CACHE_TTL = 86400
+MARKDOWN_RENDER_LOCAL_CACHE_SIZE = 256
+
 # martor
 # Choices are: "semantic", "bootstrap"
 MARTOR_THEME = 'semantic'